@@ -15,7 +15,6 @@ URL = "https://github.com/bmjcode/tkDocViewer"
 PACKAGES = find_packages()
 CLASSIFIERS = [
     "Development Status :: 7 - Inactive",
-    "Programming Language :: Python :: 2",
     "Programming Language :: Python :: 3",
     "License :: OSI Approved :: MIT License",
     "Operating System :: OS Independent",
@@ -30,4 +29,5 @@ setup(name=NAME,
       long_description_content_type="text/markdown",
       url=URL,
       packages=PACKAGES,
+      python_requires=">=3.7",
       classifiers=CLASSIFIERS)
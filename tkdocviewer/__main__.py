@@ -3,14 +3,8 @@
 import os
 import sys
 
-try:
-    # Python 3
-    from tkinter import *
-    from tkinter.filedialog import askopenfilename
-except (ImportError):
-    # Python 2
-    from Tkinter import *
-    from tkFileDialog import askopenfilename
+from tkinter import *
+from tkinter.filedialog import askopenfilename
 
 from .widget import DocViewer
 
@@ -15,6 +15,8 @@ from .shared import Backend, BackendError
 # Individual backends, in alphabetical order
 from .ghostscript import GhostscriptBackend, gs_dpi
 from .ghostxps import GhostXPSBackend
+from .pdfium import PdfiumBackend, pypdfium2
+from .pil_image import PILImageBackend
 from .pil_multiframe import PILMultiframeBackend
 
 
@@ -35,34 +37,60 @@ __all__ = [
     "BackendError",
     "GhostscriptBackend",
     "GhostXPSBackend",
+    "PdfiumBackend",
+    "PILImageBackend",
     "PILMultiframeBackend",
     "gs_dpi"
 ]
 
 # Backends by file extension
 BACKENDS_BY_EXTENSION = {
+    ".bmp": PILImageBackend,
     ".gif": PILMultiframeBackend,
+    ".ico": PILImageBackend,
+    ".jpe": PILImageBackend,
+    ".jpeg": PILImageBackend,
+    ".jpg": PILImageBackend,
+    ".pbm": PILImageBackend,
+    ".pcx": PILImageBackend,
     ".pdf": GhostscriptBackend,
+    ".pgm": PILImageBackend,
+    ".png": PILImageBackend,
+    ".pnm": PILImageBackend,
+    ".ppm": PILImageBackend,
     ".ps": GhostscriptBackend,
+    ".tga": PILImageBackend,
     ".tif": PILMultiframeBackend,
     ".tiff": PILMultiframeBackend,
+    ".xbm": PILImageBackend,
     ".xps": GhostXPSBackend,
 }
 
+# PDFium is much faster than Ghostscript at rendering PDF files, so use
+# it if it's installed. Ghostscript is still required for other formats.
+if pypdfium2:
+    BACKENDS_BY_EXTENSION[".pdf"] = PdfiumBackend
+
 # Document extensions supported by our backends
 BACKEND_DOC_EXTENSIONS = [".pdf", ".ps", ".xps"]
 
 # Image extensions supported by our backends
-BACKEND_IMAGE_EXTENSIONS = [".gif", ".tif", ".tiff"]
+BACKEND_IMAGE_EXTENSIONS = [".bmp", ".gif", ".ico",
+                            ".jpe", ".jpeg", ".jpg",
+                            ".pbm", ".pcx", ".pgm", ".png",
+                            ".pnm", ".ppm", ".tga",
+                            ".tif", ".tiff", ".xbm"]
 
 
 def AutoBackend(input_path, **kw):
     """Factory function to automatically select an appropriate backend."""
 
-    base, ext = map(str.lower, os.path.splitext(input_path))
+    # Most extensions are already lowercase, so try that first
+    ext = os.path.splitext(input_path)[1]
+    backend_cls = (BACKENDS_BY_EXTENSION.get(ext)
+                   or BACKENDS_BY_EXTENSION.get(ext.lower()))
 
-    if ext in BACKENDS_BY_EXTENSION:
-        backend_cls = BACKENDS_BY_EXTENSION[ext]
+    if backend_cls:
         return backend_cls(input_path, **kw)
 
     else:
@@ -0,0 +1,121 @@
+"""Cache of rendered pages shared by all backends.
+
+Rendering a page is expensive, so backends can store their output here
+and reuse it when the same document is displayed again.
+
+This is an internal API and subject to change at any time.
+"""
+
+import os
+import collections
+import threading
+
+
+__all__ = ["PageCache", "file_key", "page_cache"]
+
+
+class PageCache(object):
+    """Least-recently-used cache with a limit on its total size.
+
+    Sizes are estimated from the cached values: the length of raw
+    image data, or the pixel data size of a PIL image. Anything else
+    counts as a single byte.
+
+    All methods are safe to call from multiple threads.
+    """
+
+    __slots__ = ["max_size", "size", "_entries", "_lock"]
+
+    def __init__(self, max_size):
+        """Return a new cache holding at most max_size bytes."""
+
+        self.max_size = max_size
+        self.size = 0
+
+        # Maps keys to (value, size) pairs, least recently used first
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the value cached for key, or default if not present."""
+
+        with self._lock:
+            try:
+                entry = self._entries.pop(key)
+            except (KeyError):
+                return default
+
+            # Mark this entry as the most recently used
+            self._entries[key] = entry
+            return entry[0]
+
+    def put(self, key, value):
+        """Add a value to the cache, evicting older values as needed."""
+
+        size = self._sizeof(value)
+        if size > self.max_size:
+            # Don't flush the whole cache to make room for one value
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+
+            self._entries[key] = (value, size)
+            self.size += size
+
+            while self.size > self.max_size:
+                oldest_key, (oldest_value, oldest_size) = \
+                    self._entries.popitem(last=False)
+                self.size -= oldest_size
+
+    def clear(self):
+        """Remove all values from the cache."""
+
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    @staticmethod
+    def _sizeof(value):
+        """Estimate the memory used by a cached value."""
+
+        if isinstance(value, bytes):
+            return len(value)
+
+        elif hasattr(value, "getbands"):
+            # PIL image
+            w, h = value.size
+            return w * h * len(value.getbands())
+
+        else:
+            return 1
+
+
+def file_key(path):
+    """Return a cache key identifying the current contents of a file.
+
+    The key changes whenever the file is modified, so stale entries
+    are never returned; they simply age out of the cache.
+
+    Returns None if the file can't be examined.
+    """
+
+    try:
+        st = os.stat(path)
+    except (OSError):
+        return None
+
+    return os.path.realpath(path), st.st_mtime, st.st_size
+
+
+# Size limit for the page cache, in megabytes
+# This can be changed with the TKDOCVIEWER_CACHE_SIZE environment variable;
+# setting it to 0 disables caching.
+try:
+    cache_size = int(os.getenv("TKDOCVIEWER_CACHE_SIZE", 256))
+except (ValueError):
+    cache_size = 256
+
+# Cache shared by all backends
+page_cache = PageCache(cache_size * 1024 * 1024)
@@ -10,25 +10,136 @@ This is an internal API and subject to change at any time.
 
 import os
 import sys
+import atexit
 import subprocess
 import io
+import collections
+import itertools
+import re
+import threading
+import warnings
+
+# Used for rendering several batches of pages in parallel
+import concurrent.futures
 
 # Used for conversion of Postscript to PDF
 import tempfile
 
+# Used for quoting command lines in error messages
+from shlex import quote as shell_quote
+
 # Downscaling support requires PIL
 try:
-    import PIL
+    import PIL.Image
 except (ImportError):
     PIL = None
 
-from .shared import Backend, BackendError, bytes_to_str, check_output
-from .util import find_executable
+# Tk 8.6 and later can display PNG images without help from PIL
+from tkinter import TkVersion
+tk_png = TkVersion >= 8.6
+
+# Fast 2:1 downscaling of raw pages is possible with numpy
+try:
+    import numpy
+except (ImportError):
+    numpy = None
+
+from .cache import file_key, page_cache
+from .shared import (Backend, BackendError,
+                     bytes_to_str, check_output, popen, read_png, read_pnm)
+from .util import (app_dir_depth, find_dirs_containing, find_executable,
+                   version_tuple)
 
 # ------------------------------------------------------------------------
 
-# Path to the Ghostscript executable
-if sys.platform.startswith("win"):
+# Ghostscript is located the first time it's needed, rather than when
+# this module is imported, so applications that never display a PDF
+# don't pay for it. See find_ghostscript() for the details.
+gs_found = False
+gs_found_lock = threading.Lock()
+
+# Module-level variables set by find_ghostscript()
+gs_lazy_names = ("gs_names", "gs_dirs", "gs_exe", "gs_version",
+                 "gs_page_list", "gs_downscale")
+
+
+def find_ghostscript():
+    """Locate the Ghostscript executable, if we haven't already.
+
+    This sets the module-level variables named in gs_lazy_names. It's
+    safe to call repeatedly; only the first call does any real work.
+    """
+
+    global gs_found
+    global gs_names, gs_dirs, gs_exe, gs_version, gs_page_list, gs_downscale
+
+    with gs_found_lock:
+        if gs_found:
+            return
+
+        # Path to the Ghostscript executable
+        gs_names, gs_dirs = _gs_search_path()
+        if sys.platform.startswith("win"):
+            gs_exe = find_executable(gs_names, gs_dirs)
+        else:
+            # gs_dirs is just $PATH, which find_executable() searches
+            # more efficiently by default
+            gs_exe = find_executable(gs_names)
+
+        gs_version = None
+        if gs_exe:
+            # Retrieve the Ghostscript version number
+            # This doubles as a test that our Ghostscript executable is
+            # usable. The [:-1] removes the trailing newline from
+            # Ghostscript's output.
+            try:
+                gs_version = bytes_to_str(
+                    check_output([gs_exe, "--version"])[:-1])
+
+            except (OSError):
+                # There's something wrong with our Ghostscript executable!
+                gs_exe = None
+
+        # Ghostscript 9.20 and later can render an arbitrary list of pages
+        # from a PDF file in one pass using the -sPageList option
+        gs_page_list = (bool(gs_version)
+                        and version_tuple(gs_version) >= (9, 20))
+
+        # Ghostscript 9.10 and later can downscale their own output using
+        # the -dDownScaleFactor option, though only for certain devices
+        # like png16m
+        gs_downscale = (bool(gs_version)
+                        and version_tuple(gs_version) >= (9, 10))
+
+        gs_found = True
+
+
+def __getattr__(name):
+    """Locate Ghostscript on first access to the variables it sets.
+
+    This keeps gs_exe and friends working as module attributes
+    (see PEP 562).
+    """
+
+    if name in gs_lazy_names:
+        find_ghostscript()
+        return globals()[name]
+
+    raise AttributeError("module {0!r} has no attribute {1!r}"
+                         .format(__name__, name))
+
+
+def _gs_search_path():
+    """Return possible names and locations for the Ghostscript executable.
+
+    The locations are returned in the order they should be searched.
+    """
+
+    if not sys.platform.startswith("win"):
+        # Assume anything else is some kind of Unix system
+        # Most Unix systems have Ghostscript available somewhere in $PATH
+        return ("gs",), os.getenv("PATH").split(os.pathsep)
+
     from glob import glob
 
     # Possible names for the Ghostscript executable and Program Files
@@ -50,53 +161,80 @@ if sys.platform.startswith("win"):
     #    This lets your application distribute its own Ghostscript binary,
     #    which may be preferable to ensure you have a known good version.
     app_dir = os.path.dirname(os.path.realpath(sys.argv[0]))
-    for dirpath, dirnames, filenames in os.walk(app_dir):
-        for dirname in dirnames:
-            gs_dir = os.path.join(dirpath, dirname)
-            if glob(os.path.join(gs_dir, "gswin??c.exe")):
-                # Directory appears to contain a Ghostscript executable
-                gs_dirs.append(gs_dir)
+    for gs_dir in find_dirs_containing(app_dir, "gswin??c.exe",
+                                       max_depth=app_dir_depth):
+        # Directory appears to contain a Ghostscript executable
+        gs_dirs.append(gs_dir)
 
     # 2. A dedicated Ghostscript installation
     #    EXEs are usually under something like %PROGRAMFILES%\gs\gs9.27\bin.
+    #    Matching that layout directly is much faster than walking the
+    #    whole directory tree.
     for program_files in map(os.getenv, pf_vars):
         if program_files:
-            gs_dir = os.path.join(program_files, "gs")
-            for dirpath, dirnames, filenames in os.walk(gs_dir):
-                for dirname in dirnames:
-                    gs_dir = os.path.join(dirpath, dirname)
-                    # Because some of the variables in pf_vars may refer
-                    # to the same location, we have to check that we didn't
-                    # already include this directory in our search path
-                    if dirname.lower() == "bin" and not gs_dir in gs_dirs:
-                        gs_dirs.append(gs_dir)
-
-    ## 3. Other locations in %PATH%
+            gs_pattern = os.path.join(program_files, "gs", "gs*", "bin")
+            for gs_dir in sorted(glob(gs_pattern)):
+                # Because some of the variables in pf_vars may refer
+                # to the same location, we have to check that we didn't
+                # already include this directory in our search path
+                if os.path.isdir(gs_dir) and not gs_dir in gs_dirs:
+                    gs_dirs.append(gs_dir)
+
+    # 3. Anywhere else Ghostscript's installer says it put Ghostscript
+    for gs_dir in _gs_registry_dirs():
+        if os.path.isdir(gs_dir) and not gs_dir in gs_dirs:
+            gs_dirs.append(gs_dir)
+
+    ## 4. Other locations in %PATH%
     ##    Deliberately omitted because this is potentially dangerous,
     ##    and we can't be sure that whatever we find will be any good.
     #gs_dirs += os.getenv("PATH").split(os.pathsep)
 
-    # Now look for a Ghostscript executable
-    gs_exe = find_executable(gs_names, gs_dirs)
+    return gs_names, gs_dirs
+
 
-else:
-    # Assume anything else is some kind of Unix system
-    # Most Unix systems have Ghostscript available somewhere in $PATH
-    gs_names = "gs",
-    gs_dirs = os.getenv("PATH").split(os.pathsep)
-    gs_exe = find_executable(gs_names, gs_dirs)
+def _gs_registry_dirs():
+    """Return Ghostscript directories listed in the Windows registry.
 
-gs_version = None
-if gs_exe:
-    # Retrieve the Ghostscript version number
-    # This doubles as a test that our Ghostscript executable is usable.
-    # The [:-1] is to remove the trailing newline from Ghostscript's output.
-    try:
-        gs_version = bytes_to_str(check_output([gs_exe, "--version"])[:-1])
+    The Ghostscript installer records the location of its DLL, which
+    lives alongside the executables, under HKLM\\SOFTWARE\\GPL Ghostscript.
+    """
+
+    import winreg
 
-    except (OSError):
-        # There's something wrong with our Ghostscript executable!
-        gs_exe = None
+    gs_dirs = []
+
+    # Check both the 64-bit and 32-bit views of the registry
+    for view in (getattr(winreg, "KEY_WOW64_64KEY", 0),
+                 getattr(winreg, "KEY_WOW64_32KEY", 0)):
+        try:
+            root_key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE,
+                                      r"SOFTWARE\GPL Ghostscript",
+                                      0, winreg.KEY_READ | view)
+        except (OSError):
+            continue
+
+        with root_key:
+            for i in itertools.count():
+                try:
+                    version = winreg.EnumKey(root_key, i)
+                except (OSError):
+                    # No more subkeys
+                    break
+
+                try:
+                    version_key = winreg.OpenKey(root_key, version,
+                                                 0, winreg.KEY_READ | view)
+                    with version_key:
+                        gs_dll = winreg.QueryValueEx(version_key, "GS_DLL")[0]
+                except (OSError):
+                    continue
+
+                gs_dir = os.path.dirname(gs_dll)
+                if not gs_dir in gs_dirs:
+                    gs_dirs.append(gs_dir)
+
+    return gs_dirs
 
 # ------------------------------------------------------------------------
 
@@ -107,6 +245,97 @@ gs_dpi = 96
 # Resolution used internally when downscaling is enabled
 hr_dpi = 2 * gs_dpi
 
+# How often to check whether rendering has been canceled (in seconds)
+cancel_poll_interval = 0.1
+
+# Names of PIL's resampling filters, for TKDOCVIEWER_RESAMPLE
+resample_filter_names = ("NEAREST", "BOX", "BILINEAR", "HAMMING",
+                         "BICUBIC", "LANCZOS")
+
+# Ghostscript output devices for each color mode, as (PNG, raw) pairs
+# Grayscale and black-and-white pages take a fraction of the memory of
+# full-color pages. Raw black-and-white output is rendered as grayscale,
+# because Tk can't display PBM images and it can be downscaled smoothly.
+# The PNG devices are only used with -dDownScaleFactor, which pngmono
+# ignores, so black-and-white pages use pngmonod instead.
+gs_devices = {
+    "rgb": ("png16m", "ppmraw"),
+    "gray": ("pnggray", "pgmraw"),
+    "mono": ("pngmonod", "pgmraw"),
+}
+
+# Resampling filter used when we have to downscale pages ourselves
+# This can be overridden with the TKDOCVIEWER_RESAMPLE environment
+# variable, which should name one of PIL's filters (e.g. "BILINEAR").
+# Otherwise, pages are scaled down by whole-number factors using a
+# much faster box filter.
+resample_filter = None
+resample_override = False
+if PIL:
+    resample_filter = PIL.Image.BICUBIC
+
+    resample_name = os.getenv("TKDOCVIEWER_RESAMPLE")
+    if resample_name:
+        if (resample_name.upper() in resample_filter_names
+                and hasattr(PIL.Image, resample_name.upper())):
+            resample_filter = getattr(PIL.Image, resample_name.upper())
+            resample_override = True
+        else:
+            # Don't let a typo break downscaling altogether
+            warnings.warn("Ignoring unknown resampling filter in "
+                          "TKDOCVIEWER_RESAMPLE: {0}".format(resample_name),
+                          RuntimeWarning)
+
+# Maximum number of pages to render per Ghostscript process when
+# rendering several batches of pages in parallel
+gs_batch_size = 8
+
+# Matches the header of an 8-bit raw PPM or PGM image, including the
+# comment Ghostscript writes identifying itself
+ppm_header = re.compile(br"(P[56])\s+(?:#[^\n]*\n\s*)*"
+                        br"(\d+)\s+(\d+)\s+255\s")
+
+# PIL image modes for each kind of raw image matched by ppm_header
+ppm_modes = {b"P5": "L", b"P6": "RGB"}
+
+# Matches the DSC comment giving the number of pages in a Postscript file
+# This is normally near the start of the file, but may be deferred to
+# the trailer at the end with a value of "(atend)".
+dsc_pages = re.compile(br"^%%Pages:[ \t]*(\d+|\(atend\))", re.MULTILINE)
+
+# Number of bytes to search for DSC comments at either end of the file
+dsc_scan_size = 64 * 1024
+
+# Thread pool shared by all Ghostscript backends; see _get_executor()
+gs_executor = None
+gs_executor_lock = threading.Lock()
+
+# PDF conversions of Postscript files, by page cache key of the original
+# file. These are shared by all backends, so a document that's reopened
+# doesn't have to be converted again, and are removed at exit or when the
+# original file changes.
+ps_conversions = {}
+ps_conversions_lock = threading.Lock()
+
+
+@atexit.register
+def _remove_ps_conversions():
+    """Remove PDF conversions of Postscript files."""
+
+    with ps_conversions_lock:
+        _remove_files(ps_conversions.values())
+        ps_conversions.clear()
+
+
+def _remove_files(paths):
+    """Remove the specified files, ignoring any errors."""
+
+    for path in paths:
+        try:
+            os.remove(path)
+        except (OSError):
+            pass
+
 
 __all__ = ["GhostscriptBackend", "GhostscriptNotAvailable", "gs_dpi"]
 
@@ -116,26 +345,42 @@ class GhostscriptBackend(Backend):
 
     This backend supports the following formats:
     PDF -- rendered directly.
-    Postscript -- must be converted to PDF first because rendering
-      individual pages from Postscript files is not supported. This
-      happens automatically when input_file has a .ps extension.
+    Postscript -- rendered directly if the pages requested form a
+      contiguous range and the file's DSC comments say how many pages
+      it has. Otherwise it must be converted to PDF first, because
+      Ghostscript can't seek to individual pages in a Postscript file.
+      This happens automatically when input_file has a .ps extension.
 
     Internal format conversion creates temporary files, which are
     cleaned up when the backend object is destroyed.
 
     Supported keyword arguments:
-    enable_downscaling -- whether to enable downscaling using PIL.
+    enable_downscaling -- whether to render at a higher resolution,
+      then scale the output down for display.
+    color_mode -- "rgb" (the default), "gray", or "mono". Grayscale and
+      black-and-white rendering use much less memory, which helps with
+      scanned documents.
 
     This backend requires an external Ghostscript binary. Most Unix
     systems should already have this installed as 'gs'. Windows users
     can download a suitable installer from the Ghostscript website.
 
-    To enable downscaling, this backend also requires the PIL module.
-    If downscaling is enabled and the PIL module is not available, the
-    enable_downscaling argument will be silently ignored.
+    Ghostscript 9.10 and later do the actual downscaling themselves.
+    Older versions require the PIL module to resize their output. If
+    neither is possible, the enable_downscaling argument is silently
+    ignored. (Without PIL, downscaling also requires Tk 8.6 or later
+    to display the PNG images Ghostscript produces.)
+
+    If PIL is available, raw pages are passed to the user interface as
+    PIL images, which are built directly from the pixel data rather than
+    having PIL identify and decode it.
     """
 
-    __slots__ = ["enable_downscaling"]
+    __slots__ = ["color_mode", "enable_downscaling",
+                 "_cache_key", "_canceler", "_gs_device", "_gs_res",
+                 "_page_count",
+                 "_postscript",
+                 "_render_prefix", "_render_suffix"]
 
     def __init__(self, input_path, **kw):
         """Return a new Ghostscript rendering backend."""
@@ -143,6 +388,7 @@ class GhostscriptBackend(Backend):
         Backend.__init__(self, input_path, **kw)
 
         # Make sure we have a Ghostscript binary available
+        find_ghostscript()
         if not gs_exe:
             # Identify possible executable names and search dirs
             search_names = ", ".join(gs_names)
@@ -160,28 +406,67 @@ class GhostscriptBackend(Backend):
             )
 
         # Whether to enable downscaling
-        # This has no effect if PIL is not available on your system.
+        # This has no effect if neither Ghostscript nor PIL can do it.
         if "enable_downscaling" in kw:
             self.enable_downscaling = kw["enable_downscaling"]
         else:
             self.enable_downscaling = False
 
+        # Event used to cancel rendering, if any
+        if "canceler" in kw:
+            self._canceler = kw["canceler"]
+        else:
+            self._canceler = None
+
+        # Color model for Ghostscript rendering
+        if "color_mode" in kw:
+            self.color_mode = kw["color_mode"]
+        else:
+            self.color_mode = "rgb"
+
+        if not self.color_mode in gs_devices:
+            raise BackendError(
+                "Unsupported color mode: {0}.\n"
+                "Must be one of {1}."
+                .format(self.color_mode, ", ".join(sorted(gs_devices)))
+            )
+        png_device, raw_device = gs_devices[self.color_mode]
+
+        # Resolution and output device for Ghostscript rendering
+        if self.enable_downscaling and (PIL or (gs_downscale and tk_png)):
+            self._gs_res = hr_dpi
+        else:
+            self._gs_res = gs_dpi
+
+        if self._gs_res != gs_dpi and gs_downscale:
+            # Ghostscript can't downscale pnm output, so use PNG instead
+            self._gs_device = png_device
+        else:
+            # Raw PPM is the only full-color image format that all
+            # versions of Tk are guaranteed to support.
+            self._gs_device = raw_device
+
+        # Identifies the input file in the page cache
+        # This must refer to the original file, not a converted copy.
+        self._cache_key = file_key(input_path)
+
+        # Page count of the input file, once we know it
+        self._page_count = None
+
         # Determine whether we can render this file based on its extension
         base, ext = os.path.splitext(input_path)
+        ext = ext.lower()
 
-        if ext.lower() == ".pdf":
+        # Whether the input file is Postscript that hasn't been converted
+        self._postscript = ext == ".ps"
+
+        if ext == ".pdf":
             # Render PDF files directly
             self.input_path = input_path
 
-        elif ext.lower() == ".ps":
-            # Convert Postscript files to PDF
-            fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
-            os.close(fd)
-            self.render_to_pdf(pdf_path)
-
-            # Render the converted PDF file
-            self.input_path = pdf_path
-            self.temp_files.append(pdf_path)
+        elif ext == ".ps":
+            # Postscript files are converted to PDF later, if necessary
+            self.input_path = input_path
 
         else:
             raise BackendError(
@@ -190,15 +475,55 @@ class GhostscriptBackend(Backend):
                 .format(input_path)
             )
 
+        # Ghostscript command line to render pages, less the page selection
+        # This is the same for every page, so we might as well build it once.
+        self._render_prefix = [gs_exe,
+                               "-q",
+                               "-r{0}".format(self._gs_res),
+                               "-dBATCH",
+                               "-dNOPAUSE",
+                               "-dNOSAFER",
+                               "-dPDFSettings=/SCREEN",
+                               "-dPrinted=false",
+                               "-dTextAlphaBits=4",
+                               "-dGraphicsAlphaBits=4",
+                               "-dCOLORSCREEN",
+                               "-dDOINTERPOLATE"]
+        self._render_suffix = []
+
+        if self._gs_device == png_device and self._gs_res != gs_dpi:
+            # Let Ghostscript scale down its own output
+            self._render_suffix.append("-dDownScaleFactor={0}"
+                                       .format(self._gs_res // gs_dpi))
+
+        self._render_suffix += ["-sDEVICE={0}".format(self._gs_device),
+                                "-sOutputFile=-"]
+
     def page_count(self):
         """Return the number of pages in the input file."""
 
-        base, ext = os.path.splitext(self.input_path)
-        if ext.lower() != ".pdf":
-            raise BackendError("Only PDF files are supported.")
+        if self._page_count is not None:
+            return self._page_count
+
+        if self._postscript:
+            # Postscript files may tell us their page count directly
+            self._page_count = self._dsc_page_count()
+            if self._page_count is not None:
+                return self._page_count
+
+            # Otherwise, we'll have to ask Ghostscript
+            self._convert_to_pdf()
+
+        if self._cache_key:
+            cache_key = self._cache_key + ("page_count",)
+            self._page_count = page_cache.get(cache_key)
+            if self._page_count is not None:
+                return self._page_count
 
         # The Ghostscript interpreter expects forward slashes in file paths
-        gs_input_path = self.input_path.replace(os.sep, "/")
+        gs_input_path = self.input_path
+        if os.sep != "/":
+            gs_input_path = gs_input_path.replace(os.sep, "/")
 
         # Ghostscript command to return the page count of a PDF file
         gs_pc_command = "({0}) (r) file runpdfbegin pdfpagecount = quit"
@@ -212,63 +537,82 @@ class GhostscriptBackend(Backend):
                    gs_pc_command.format(gs_input_path)]
 
         # Return the page count if it's a valid PDF, or None otherwise
-        return int(self._check_output(gs_args))
+        self._page_count = int(self._check_output(gs_args))
+        if self._cache_key:
+            page_cache.put(cache_key, self._page_count)
+        return self._page_count
 
     def render_page(self, page_num):
         """Render the specified page of the input file."""
 
-        base, ext = os.path.splitext(self.input_path)
-        if ext.lower() != ".pdf":
-            raise BackendError("Only PDF files are supported.")
+        # Read the page straight from Ghostscript's output as it's
+        # rendered, rather than collecting it all with check_output()
+        rendered = self._render_uncached([page_num])
+        try:
+            return next(rendered)
+        finally:
+            rendered.close()
 
-        # Resolution for Ghostscript rendering
-        if PIL and self.enable_downscaling:
-            gs_res = hr_dpi
-        else:
-            gs_res = gs_dpi
+    def render_page_array(self, page_num):
+        """Render the specified page as a numpy array of RGB pixels.
 
-        # Ghostscript command line
-        gs_args = [gs_exe,
-                   "-q",
-                   "-r{0}".format(gs_res),
-                   "-dBATCH",
-                   "-dNOPAUSE",
-                   "-dNOSAFER",
-                   "-dPDFSettings=/SCREEN",
-                   "-dPrinted=false",
-                   "-dTextAlphaBits=4",
-                   "-dGraphicsAlphaBits=4",
-                   "-dCOLORSCREEN",
-                   "-dDOINTERPOLATE",
-
-                   # Newer versions of Ghostscript support the -sPageList
-                   # option, but our user's version might not have it.
-                   # This approach is clumsier, but backwards-compatible.
-                   "-dFirstPage={0}".format(page_num),
-                   "-dLastPage={0}".format(page_num),
-
-                   # Raw PPM is the only full-color image format that all
-                   # versions of Tk are guaranteed to support.
-                   "-sDEVICE=ppmraw",
-                   "-sOutputFile=-",
-                   self.input_path]
-
-        # Call Ghostscript to render the PDF
-        image_data = self._check_output(gs_args)
-
-        if PIL and self.enable_downscaling:
-            page_bytes = io.BytesIO(image_data)
-            page_image = PIL.Image.open(page_bytes)
+        The array has shape (height, width, 3). Where possible it is a
+        read-only view of Ghostscript's output rather than a copy, so
+        applications can crop or otherwise examine pages without going
+        through PIL.
+        """
 
-            # Scale down the output from Ghostscript
-            w, h = page_image.size
-            return page_image.resize((w * gs_dpi // hr_dpi,
-                                      h * gs_dpi // hr_dpi),
-                                     resample=PIL.Image.BICUBIC)
+        if not numpy:
+            raise BackendError("Rendering to an array requires numpy.")
 
-        else:
-            # Return the image data from Ghostscript directly
-            return image_data
+        image_data = self.render_page(page_num)
+
+        if hasattr(image_data, "getbands"):
+            # PIL image
+            return numpy.asarray(image_data.convert("RGB"))
+
+        pixels = self._ppm_to_array(image_data)
+        if pixels is None:
+            raise BackendError(
+                "Could not convert page {0} of {1} to an array "
+                "without PIL."
+                .format(page_num, self.input_path)
+            )
+        return pixels
+
+    def render_pages(self, pages):
+        """Render the specified pages of the input file, in order.
+
+        Pages rendered previously are served from the page cache.
+        Where possible, the rest are rendered in batches so we don't pay
+        Ghostscript's startup cost for every page. On multi-core systems,
+        several batches are rendered in parallel.
+        """
+
+        pages = list(pages)
+        if not self._cache_key:
+            for image_data in self._render_uncached(pages):
+                yield image_data
+            return
+
+        # Look up every page now, so nothing we found can be evicted
+        # while we're waiting on Ghostscript for the others
+        cache_keys = [self._page_key(page_num) for page_num in pages]
+        cached = [page_cache.get(cache_key) for cache_key in cache_keys]
+
+        missing = [page_num for page_num, image_data in zip(pages, cached)
+                   if image_data is None]
+        rendered = self._render_uncached(missing)
+
+        try:
+            for cache_key, image_data in zip(cache_keys, cached):
+                if image_data is None:
+                    image_data = next(rendered)
+                    page_cache.put(cache_key, image_data)
+                yield image_data
+
+        finally:
+            rendered.close()
 
     def render_to(self, device, output_path, *args):
         """Render the input file to the specified Ghostscript output device.
@@ -306,6 +650,131 @@ class GhostscriptBackend(Backend):
 
     # ------------------------------------------------------------------------
 
+    def _batch_pages(self, pages, batch_size):
+        """Divide a list of pages into batches for _render_batch()."""
+
+        batches = []
+        batch = []
+
+        for page_num in pages:
+            if batch:
+                if gs_page_list:
+                    # Ghostscript always renders a page list in document
+                    # order, so a batch can only contain ascending pages
+                    fits = page_num > batch[-1]
+                else:
+                    # Older versions of Ghostscript can only render a
+                    # contiguous range of pages in one pass
+                    fits = page_num == batch[-1] + 1
+
+                if len(batch) >= batch_size or not fits:
+                    batches.append(batch)
+                    batch = []
+
+            batch.append(page_num)
+
+        if batch:
+            batches.append(batch)
+
+        return batches
+
+    @staticmethod
+    def _get_executor():
+        """Return the thread pool used for parallel rendering.
+
+        The pool is shared by every document being rendered, so the
+        number of Ghostscript processes running at once never exceeds
+        the number of CPUs, however many DocViewers are open.
+        """
+
+        global gs_executor
+
+        with gs_executor_lock:
+            if not gs_executor:
+                # Each worker thread spends nearly all its time waiting on
+                # a Ghostscript subprocess, so threads are sufficient here.
+                gs_executor = concurrent.futures.ThreadPoolExecutor(
+                    os.cpu_count() or 1)
+
+            return gs_executor
+
+    def _page_key(self, page_num):
+        """Return the page cache key for a page of the input file."""
+
+        return self._cache_key + (page_num, self._gs_res, self._gs_device)
+
+    def _render_uncached(self, pages):
+        """Render the specified pages, bypassing the page cache."""
+
+        cpu_count = os.cpu_count() or 1
+
+        if pages and self._postscript:
+            if (gs_page_list
+                and self._page_count is not None
+                and pages[-1] - pages[0] == len(pages) - 1
+                and pages == sorted(pages)):
+                # Ghostscript can render a contiguous range of pages
+                # from a Postscript file in one pass, as long as we
+                # know it has that many pages
+                for image_data in self._render_batch(pages):
+                    yield image_data
+                return
+
+            self._convert_to_pdf()
+
+        if cpu_count < 2:
+            # Render everything in one batch if we can
+            batch_size = len(pages)
+        else:
+            # Make enough batches to keep every CPU busy
+            batch_size = (len(pages) + cpu_count - 1) // cpu_count
+            batch_size = max(1, min(batch_size, gs_batch_size))
+
+        batches = self._batch_pages(pages, batch_size)
+        workers = min(cpu_count, len(batches))
+
+        if workers < 2:
+            # Nothing to gain from a thread pool
+            for batch in batches:
+                for image_data in self._render_batch(batch):
+                    yield image_data
+            return
+
+        executor = self._get_executor()
+
+        # Batches currently being rendered, in the order requested.
+        # This is capped at the number of workers so we don't hold
+        # every page of a long document in memory at once.
+        pending = collections.deque()
+        batch_iter = iter(batches)
+
+        try:
+            for batch in itertools.islice(batch_iter, workers):
+                pending.append(executor.submit(list,
+                                               self._render_batch(batch)))
+
+            while pending:
+                batch_data = pending.popleft().result()
+
+                # Start on the next batch before handing this one over
+                batch = next(batch_iter, None)
+                if batch is not None:
+                    pending.append(executor.submit(list,
+                                                   self._render_batch(batch)))
+
+                for image_data in batch_data:
+                    yield image_data
+
+        finally:
+            # Abandon any batches we haven't started on yet
+            for future in pending:
+                future.cancel()
+
+    def _canceled(self):
+        """Return whether rendering has been canceled."""
+
+        return bool(self._canceler) and self._canceler.is_set()
+
     def _check_output(self, args):
         """Wrapper for check_output() to handle error conditions."""
 
@@ -315,46 +784,313 @@ class GhostscriptBackend(Backend):
         except (subprocess.CalledProcessError) as err:
             # Something went wrong with the call to Ghostscript
             if err.output:
-                # Save the output from Ghostscript
-                gs_output = bytes_to_str(err.output)[:-1]
-
-                # Quote command line arguments containing spaces
-                args = []
-                for arg in err.cmd:
-                    if " " in arg:
-                        args.append('"{0}"'.format(arg))
-                    else:
-                        args.append(arg)
-
                 # Raise a more informative exception
-                raise BackendError(
-                    "{0}\n"
-                    "\n"
-                    "Ghostscript command line (return code = {1}):\n"
-                    "{2}"
-                    .format(gs_output, err.returncode, " ".join(args))
-                )
+                raise self._error(bytes_to_str(err.output)[:-1],
+                                  err.returncode, err.cmd)
 
             else:
                 # Raise the exception as-is
                 raise
 
+    def _convert_to_pdf(self):
+        """Convert a Postscript input file to PDF, and render that instead."""
+
+        with ps_conversions_lock:
+            pdf_path = ps_conversions.get(self._cache_key)
+
+        if not (pdf_path and os.path.isfile(pdf_path)):
+            fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
+            os.close(fd)
+
+            try:
+                self.render_to_pdf(pdf_path)
+            except (Exception):
+                os.remove(pdf_path)
+                raise
+
+            if self._cache_key:
+                # Keep the converted file for other backends to reuse
+                with ps_conversions_lock:
+                    existing = ps_conversions.get(self._cache_key)
+                    if existing and os.path.isfile(existing):
+                        # Another backend converted the same file while
+                        # we were at it, so use theirs instead
+                        stale = [pdf_path]
+                        pdf_path = existing
+
+                    else:
+                        # Conversions of earlier versions of this file
+                        # will never be used again
+                        realpath = self._cache_key[0]
+                        stale = [ps_conversions.pop(key)
+                                 for key in list(ps_conversions)
+                                 if key[0] == realpath]
+                        ps_conversions[self._cache_key] = pdf_path
+
+                _remove_files(stale)
+            else:
+                self.temp_files.append(pdf_path)
+
+        # Render the converted PDF file
+        self.input_path = pdf_path
+        self._postscript = False
+
+    def _dsc_page_count(self):
+        """Return the page count from a Postscript file's DSC comments.
+
+        Returns None if the file doesn't specify how many pages it has.
+        """
+
+        with open(self.input_path, "rb") as ps_file:
+            match = dsc_pages.search(ps_file.read(dsc_scan_size))
+            if not match:
+                return None
+            page_count = match.group(1)
+
+            if page_count == b"(atend)":
+                # The page count is in the trailer at the end of the file
+                ps_file.seek(0, os.SEEK_END)
+                ps_file.seek(max(0, ps_file.tell() - dsc_scan_size))
+                matches = dsc_pages.findall(ps_file.read())
+                if not matches:
+                    return None
+                page_count = matches[-1]
+
+        if not page_count.isdigit():
+            return None
+
+        # A page count of zero probably means this is an EPS file
+        return int(page_count) or None
+
+    def _error(self, message, returncode, args):
+        """Return an exception describing a failed call to Ghostscript."""
+
+        # Quote the command line the way the user's shell would expect
+        if sys.platform.startswith("win"):
+            command_line = subprocess.list2cmdline(args)
+        else:
+            command_line = " ".join(map(shell_quote, args))
+
+        return BackendError(
+            "{0}\n"
+            "\n"
+            "Ghostscript command line (return code = {1}):\n"
+            "{2}"
+            .format(message, returncode, command_line)
+        )
+
+    def _finish_page(self, image_data):
+        """Process a page of image data rendered by Ghostscript."""
+
+        if self._gs_device.startswith("png") and not PIL:
+            # Let Tk decode the PNG data itself
+            return image_data
+
+        elif self._gs_device.startswith("png"):
+            # Ghostscript has already scaled down its output if needed,
+            # so all we need to do is decode it
+            page_image = PIL.Image.open(io.BytesIO(image_data))
+            page_image.load()
+            return page_image
+
+        if self._gs_res != gs_dpi and not resample_override:
+            page_image = self._reduce_page(image_data)
+            if page_image is not None:
+                return page_image
+
+        if self._gs_res != gs_dpi:
+            page_image = self._ppm_to_image(image_data)
+
+            # Scale down the output from Ghostscript
+            w, h = page_image.size
+            return page_image.resize((w * gs_dpi // self._gs_res,
+                                      h * gs_dpi // self._gs_res),
+                                     resample=resample_filter)
+
+        elif PIL:
+            # Pass the page on as a PIL image, like the other backends
+            return self._ppm_to_image(image_data)
+
+        else:
+            # Return the image data from Ghostscript directly
+            return image_data
+
+    def _reduce_page(self, image_data):
+        """Scale down a raw page using a box filter, if possible.
+
+        This only works when the rendering resolution is a whole-number
+        multiple of the display resolution, but is much faster than
+        resampling with a general-purpose filter.
+
+        Returns None if none of the available methods are suitable.
+        """
+
+        if self._gs_res % gs_dpi != 0:
+            return None
+
+        elif hasattr(PIL.Image.Image, "reduce"):
+            # Pillow 7.0 and later can do this themselves
+            page_image = self._ppm_to_image(image_data)
+            return page_image.reduce(self._gs_res // gs_dpi)
+
+        elif self._gs_res == 2 * gs_dpi and numpy:
+            pixels = self._ppm_to_array(image_data)
+            if pixels is not None:
+                # Average each 2x2 block of pixels
+                h, w = pixels.shape[0] // 2, pixels.shape[1] // 2
+                blocks = pixels[:2 * h, :2 * w].reshape(h, 2, w, 2, 3)
+                pixels = blocks.astype(numpy.uint16).sum(axis=(1, 3)) >> 2
+                return PIL.Image.fromarray(pixels.astype(numpy.uint8))
+
+        return None
+
+    @staticmethod
+    def _ppm_to_array(image_data):
+        """Return a numpy array of the pixels in a raw PPM image.
+
+        Returns None if the image is not an 8-bit raw PPM.
+        """
+
+        match = ppm_header.match(image_data)
+        if not match or match.group(1) != b"P6":
+            return None
+
+        w, h = map(int, match.group(2, 3))
+        return numpy.frombuffer(image_data, dtype=numpy.uint8,
+                                offset=match.end()).reshape(h, w, 3)
+
+    @staticmethod
+    def _ppm_to_image(image_data):
+        """Return a PIL image of a raw PPM or PGM image.
+
+        Since we know what Ghostscript's output looks like, we can load
+        the pixel data directly instead of having PIL identify and
+        decode it. Other images are still handed off to PIL.
+
+        Grayscale images share the memory of image_data, but PIL can't
+        map packed RGB pixels, so color images are copied once.
+        """
+
+        match = ppm_header.match(image_data)
+        if not match:
+            return PIL.Image.open(io.BytesIO(image_data))
+
+        mode = ppm_modes[match.group(1)]
+        w, h = map(int, match.group(2, 3))
+        pixels = memoryview(image_data)[match.end():]
+        return PIL.Image.frombuffer(mode, (w, h), pixels, "raw", mode, 0, 1)
+
+    def _render_args(self, *page_args):
+        """Return the Ghostscript command line to render the input file.
+
+        Positional arguments specify which pages to render.
+        """
+
+        # Everything but the page selection was worked out in advance
+        return (self._render_prefix + list(page_args) + self._render_suffix
+                + [self.input_path])
+
+    def _render_batch(self, pages):
+        """Render a batch of pages using a single Ghostscript process.
+
+        This is a generator yielding the image data for each page.
+        Closing it early stops the Ghostscript process.
+        """
+
+        if pages[-1] - pages[0] == len(pages) - 1:
+            # This is a contiguous range of pages
+            page_args = ["-dFirstPage={0}".format(pages[0]),
+                         "-dLastPage={0}".format(pages[-1])]
+        else:
+            page_list = ",".join(str(page_num) for page_num in pages)
+            page_args = ["-sPageList={0}".format(page_list)]
+
+        gs_args = self._render_args(*page_args)
+
+        if self._gs_device.startswith("png"):
+            read_image = read_png
+        else:
+            read_image = read_pnm
+
+        # Ghostscript's error messages go to a temporary file rather than
+        # a pipe, so it can't stall writing them while we wait on stdout
+        with tempfile.TemporaryFile() as gs_errors:
+            proc = popen(gs_args, stdout=subprocess.PIPE, stderr=gs_errors)
+
+            # Set when we're done with this Ghostscript process
+            finished = threading.Event()
+
+            if self._canceler:
+                # Stop Ghostscript as soon as rendering is canceled,
+                # rather than waiting for it to finish the current page
+                watcher = threading.Thread(target=self._watch_for_cancel,
+                                           args=(proc, finished))
+                watcher.daemon = True
+                watcher.start()
+
+            try:
+                for page_num in pages:
+                    try:
+                        image_data = read_image(proc.stdout)
+                    except (BackendError):
+                        image_data = None
+
+                    if image_data is None and self._canceled():
+                        # We stopped Ghostscript ourselves
+                        return
+
+                    elif image_data is None:
+                        # Ghostscript stopped early; find out why
+                        returncode = proc.wait()
+                        gs_errors.seek(0)
+                        message = bytes_to_str(gs_errors.read())[:-1]
+                        if not message:
+                            message = ("Ghostscript did not render page {0}."
+                                       .format(page_num))
+                        raise self._error(message, returncode, gs_args)
+
+                    yield self._finish_page(image_data)
+
+            finally:
+                finished.set()
+
+                # Stop Ghostscript if we were closed before it finished
+                proc.stdout.close()
+                if proc.poll() is None:
+                    proc.kill()
+                proc.wait()
+
+    def _watch_for_cancel(self, proc, finished):
+        """Kill a Ghostscript process if rendering is canceled.
+
+        This runs in its own thread until the finished event is set.
+        """
+
+        while not finished.wait(cancel_poll_interval):
+            if self._canceler.is_set():
+                if proc.poll() is None:
+                    proc.kill()
+                return
+
     # ------------------------------------------------------------------------
 
     @staticmethod
     def executable():
         """Return the path to the Ghostscript executable."""
 
+        find_ghostscript()
         return gs_exe
 
     @staticmethod
     def search_path():
         """Return the search path for the Ghostscript executable."""
 
+        find_ghostscript()
         return gs_dirs
 
     @staticmethod
     def version():
         """Return the version of the Ghostscript executable."""
 
+        find_ghostscript()
         return gs_version
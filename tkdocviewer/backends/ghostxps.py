@@ -6,64 +6,103 @@ This is an internal API and subject to change at any time.
 import os
 import sys
 import subprocess
+import threading
 
 # Used for conversion of XPS to PDF
 import tempfile
 
+from .cache import file_key
 from .ghostscript import GhostscriptBackend
 from .shared import Backend, BackendError, check_output
-from .util import find_executable
+from .util import app_dir_depth, find_dirs_containing, find_executable
 
 # -------------------------------------------------------------------------
 
-# Path to the GhostXPS executable
-if sys.platform.startswith("win"):
-    from glob import glob
-
-    # Possible names for the GhostXPS executable
-    if sys.maxsize > 2**32 or os.getenv("ProgramW6432"):
-        gxps_names = "gxpswin64.exe", "gxpswin32.exe"
-    else:
-        gxps_names = "gxpswin32.exe",
-
-    # Possible locations to look for GhostXPS...
-    gxps_dirs = []
-
-    # GhostXPS doesn't include an installer as of version 9.27,
-    # so if it's available, it's probably under your application directory
-    app_dir = os.path.dirname(os.path.realpath(sys.argv[0]))
-    for dirpath, dirnames, filenames in os.walk(app_dir):
-        for dirname in dirnames:
-            gxps_dir = os.path.join(dirpath, dirname)
-            if glob(os.path.join(gxps_dir, "gxpswin??.exe")):
+# GhostXPS is located the first time it's needed, rather than when
+# this module is imported, just like Ghostscript.
+gxps_found = False
+gxps_found_lock = threading.Lock()
+
+# Module-level variables set by find_ghostxps()
+gxps_lazy_names = ("gxps_names", "gxps_dirs", "gxps_exe")
+
+
+def find_ghostxps():
+    """Locate the GhostXPS executable, if we haven't already.
+
+    This sets the module-level variables named in gxps_lazy_names.
+    It's safe to call repeatedly; only the first call does any real work.
+    """
+
+    global gxps_found
+    global gxps_names, gxps_dirs, gxps_exe
+
+    with gxps_found_lock:
+        if gxps_found:
+            return
+
+        # Path to the GhostXPS executable
+        if sys.platform.startswith("win"):
+            # Possible names for the GhostXPS executable
+            if sys.maxsize > 2**32 or os.getenv("ProgramW6432"):
+                gxps_names = "gxpswin64.exe", "gxpswin32.exe"
+            else:
+                gxps_names = "gxpswin32.exe",
+
+            # Possible locations to look for GhostXPS...
+            gxps_dirs = []
+
+            # GhostXPS doesn't include an installer as of version 9.27,
+            # so if it's available, it's probably under your application
+            # directory
+            app_dir = os.path.dirname(os.path.realpath(sys.argv[0]))
+            for gxps_dir in find_dirs_containing(app_dir, "gxpswin??.exe",
+                                                 max_depth=app_dir_depth):
                 # Directory appears to contain a GhostXPS executable
                 gxps_dirs.append(gxps_dir)
 
-    # Now find the executable
-    gxps_exe = find_executable(gxps_names, gxps_dirs)
+            # Now find the executable
+            gxps_exe = find_executable(gxps_names, gxps_dirs)
+
+        else:
+            # Assume anything else is some kind of Unix system
+            # If GhostXPS is available, chances are it's somewhere in $PATH
+            gxps_names = "gxps",
+            gxps_dirs = os.getenv("PATH").split(os.pathsep)
+            gxps_exe = find_executable(gxps_names)
+
+        gxps_found = True
 
-else:
-    # Assume anything else is some kind of Unix system
-    # If GhostXPS is available, chances are it's somewhere in $PATH
-    gxps_names = "gxps",
-    gxps_dirs = os.getenv("PATH").split(os.pathsep)
-    gxps_exe = find_executable(gxps_names, gxps_dirs)
+
+def __getattr__(name):
+    """Locate GhostXPS on first access to the variables it sets.
+
+    This keeps gxps_exe and friends working as module attributes
+    (see PEP 562).
+    """
+
+    if name in gxps_lazy_names:
+        find_ghostxps()
+        return globals()[name]
+
+    raise AttributeError("module {0!r} has no attribute {1!r}"
+                         .format(__name__, name))
 
 
 __all__ = ["GhostXPSBackend"]
 
 
-class GhostXPSBackend(Backend):
+class GhostXPSBackend(GhostscriptBackend):
     """Backend to render a document using GhostXPS.
 
     Documents are internally converted to PDF, then rendered using
     the Ghostscript backend. Temporary files created by this process
     are cleaned up when the backend object is destroyed.
 
-    This backend requires an external GhostXPS binary.
+    This backend requires external GhostXPS and Ghostscript binaries.
     """
 
-    __slots__ = ["page_count", "render_page"]
+    __slots__ = []
 
     def __init__(self, input_path, **kw):
         """Return a new GhostXPS rendering backend."""
@@ -71,6 +110,7 @@ class GhostXPSBackend(Backend):
         Backend.__init__(self, input_path, **kw)
 
         # Make sure we have a GhostXPS binary available
+        find_ghostxps()
         if not gxps_exe:
             # Identify possible executable names and search dirs
             search_names = ", ".join(gxps_names)
@@ -99,10 +139,17 @@ class GhostXPSBackend(Backend):
                      self.input_path]
 
         # Convert the input file to PDF
-        check_output(gxps_args)
+        try:
+            check_output(gxps_args)
+
+            # Render the converted file using the Ghostscript backend
+            GhostscriptBackend.__init__(self, pdf_path, **kw)
+
+        except (Exception):
+            os.remove(pdf_path)
+            raise
+
         self.temp_files.append(pdf_path)
 
-        # Create a Ghostscript backend, and forward method calls to it
-        gs = GhostscriptBackend(pdf_path, **kw)
-        self.page_count = gs.page_count
-        self.render_page = gs.render_page
+        # Cache pages under the XPS file, not the temporary PDF
+        self._cache_key = file_key(input_path)
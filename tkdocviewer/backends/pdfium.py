@@ -0,0 +1,182 @@
+"""Backend for rendering PDF documents using PDFium.
+
+This is an internal API and subject to change at any time.
+"""
+
+import threading
+
+try:
+    import pypdfium2
+except (ImportError):
+    pypdfium2 = None
+
+# Rendered pages are returned as PIL images where possible
+try:
+    import PIL.Image
+except (ImportError):
+    PIL = None
+
+from .cache import file_key, page_cache
+from .ghostscript import gs_dpi, gs_devices
+from .shared import Backend, BackendError
+
+# ------------------------------------------------------------------------
+
+# PDFium renders at this many pixels per unit of scale
+# (PDF page sizes are measured in points, 1/72 of an inch)
+pdfium_dpi = 72
+
+# PDFium itself is not thread-safe, so only one thread may use it at a
+# time, even when working on different documents
+pdfium_lock = threading.Lock()
+
+
+__all__ = ["PdfiumBackend"]
+
+
+class PdfiumBackend(Backend):
+    """Backend to render a PDF document using PDFium.
+
+    PDFium runs in-process, so unlike Ghostscript there's no external
+    program to start for each document, and pages can be rendered one
+    at a time without having to parse the document again.
+
+    Supported keyword arguments:
+    color_mode -- "rgb" (the default), "gray", or "mono", just like the
+      Ghostscript backend. Black-and-white pages are rendered in
+      grayscale if PIL is not available.
+
+    PDFium anti-aliases its output well enough on its own, so the
+    enable_downscaling argument is silently ignored.
+
+    This backend requires the pypdfium2 module. If PIL is available,
+    pages are returned as PIL images; otherwise they're returned as
+    raw PPM or PGM data.
+    """
+
+    __slots__ = ["color_mode", "_cache_key", "_pdf"]
+
+    def __init__(self, input_path, **kw):
+        """Return a new PDFium rendering backend."""
+
+        Backend.__init__(self, input_path, **kw)
+
+        # Set this first so close() works even if we fail below
+        self._pdf = None
+
+        if not pypdfium2:
+            raise BackendError(
+                "Could not render {0} because pypdfium2 is not available "
+                "on your system."
+                .format(input_path)
+            )
+
+        # Color model for rendering
+        # This accepts the same values as the Ghostscript backend.
+        if "color_mode" in kw:
+            self.color_mode = kw["color_mode"]
+        else:
+            self.color_mode = "rgb"
+
+        if not self.color_mode in gs_devices:
+            raise BackendError(
+                "Unsupported color mode: {0}.\n"
+                "Must be one of {1}."
+                .format(self.color_mode, ", ".join(sorted(gs_devices)))
+            )
+
+        # Identifies the input file in the page cache
+        self._cache_key = file_key(input_path)
+
+        try:
+            with pdfium_lock:
+                self._pdf = pypdfium2.PdfDocument(input_path)
+
+        except (pypdfium2.PdfiumError) as err:
+            raise BackendError(
+                "Could not render {0}.\n"
+                "PDFium reported an error: {1}"
+                .format(input_path, err)
+            )
+
+    def close(self):
+        """Close the input file and clean up temporary files."""
+
+        if self._pdf is not None:
+            with pdfium_lock:
+                self._pdf.close()
+            self._pdf = None
+
+        Backend.close(self)
+
+    def page_count(self):
+        """Return the number of pages in the input file."""
+
+        with pdfium_lock:
+            return len(self._pdf)
+
+    def render_page(self, page_num):
+        """Render the specified page of the input file."""
+
+        if self._cache_key:
+            cache_key = self._cache_key + (page_num, "pdfium",
+                                           self.color_mode)
+            image_data = page_cache.get(cache_key)
+            if image_data is not None:
+                return image_data
+
+        with pdfium_lock:
+            page = self._pdf[page_num - 1]
+            try:
+                # Ask for RGB rather than PDFium's native BGR byte order,
+                # since that's what PIL and Tk expect
+                bitmap = page.render(scale=gs_dpi / float(pdfium_dpi),
+                                     grayscale=self.color_mode != "rgb",
+                                     rev_byteorder=True)
+                try:
+                    image_data = self._finish_page(bitmap)
+                finally:
+                    bitmap.close()
+            finally:
+                page.close()
+
+        if self._cache_key:
+            page_cache.put(cache_key, image_data)
+        return image_data
+
+    def _finish_page(self, bitmap):
+        """Convert a page rendered by PDFium to image data we can return.
+
+        The result must not refer to the bitmap's memory, which is freed
+        when the bitmap is closed.
+        """
+
+        if PIL:
+            page_image = bitmap.to_pil()
+            if self.color_mode == "mono":
+                return page_image.convert("1")
+            elif page_image.mode == "L":
+                # PIL shares memory with grayscale bitmaps
+                return page_image.copy()
+            else:
+                return page_image
+
+        # Without PIL, build a raw PPM or PGM image Tk can display itself
+        if self.color_mode == "rgb":
+            magic, channels = "P6", 3
+        else:
+            magic, channels = "P5", 1
+
+        width, height, stride = bitmap.width, bitmap.height, bitmap.stride
+        pixels = memoryview(bitmap.buffer).cast("B")
+        header = "{0}\n{1} {2}\n255\n".format(magic, width, height)
+
+        row_size = width * channels
+        if stride == row_size:
+            rows = [pixels[:stride * height].tobytes()]
+        else:
+            # Skip the padding at the end of each row
+            rows = [pixels[y * stride:y * stride + row_size].tobytes()
+                    for y in range(height)]
+
+        return header.encode("ascii") + b"".join(rows)
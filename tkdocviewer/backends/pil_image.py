@@ -0,0 +1,25 @@
+"""Backend for rendering single-frame images using PIL.
+
+These are internal APIs and subject to change at any time.
+"""
+
+from .pil_multiframe import PILMultiframeBackend
+
+
+class PILImageBackend(PILMultiframeBackend):
+    """Backend for rendering single-frame images.
+
+    This is used for common image formats like JPEG and PNG, so they're
+    decoded in the rendering thread instead of holding up the user
+    interface. Only the first frame is rendered, even if the file
+    happens to contain more.
+
+    This backend requires the PIL module.
+    """
+
+    __slots__ = []
+
+    def page_count(self):
+        """Return the number of pages in the input file."""
+
+        return 1
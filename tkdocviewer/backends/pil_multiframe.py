@@ -4,32 +4,39 @@ These are internal APIs and subject to change at any time.
 """
 
 try:
-    import PIL
+    import PIL.Image
 except (ImportError):
     PIL = None
 
 from .shared import Backend, BackendError, check_output
 
 
+# Image modes PIL.ImageTk can display without converting them first
+tk_modes = "1", "L", "RGB", "RGBA"
+
+
 class PILMultiframeBackend(Backend):
     """Backend for rendering multi-frame images.
 
     This backend is used to render image formats supporting multiple
     frames in a single file, such as GIF and TIFF.
 
-    Note: For performance reasons, support for rendering single-frame
-    images is built into the DocViewer widget.
+    Single-frame images are rendered by PILImageBackend instead, which
+    only looks at the first frame.
 
     This backend requires the PIL module.
     """
 
-    __slots__ = ["im"]
+    __slots__ = ["im", "_page_count"]
 
     def __init__(self, input_path, **kw):
         """Return a new rendering backend."""
 
         Backend.__init__(self, input_path, **kw)
 
+        # Set this first so close() works even if we fail below
+        self.im = None
+
         if PIL:
             self.im = PIL.Image.open(input_path)
 
@@ -40,12 +47,31 @@ class PILMultiframeBackend(Backend):
                 .format(input_path)
             )
 
+        # Page count of the input file, once we know it
+        self._page_count = None
+
+    def close(self):
+        """Close the input file and clean up temporary files."""
+
+        if self.im is not None:
+            self.im.close()
+            self.im = None
+
+        Backend.close(self)
+
     def page_count(self):
         """Return the number of pages in the input file."""
 
-        if hasattr(self.im, "num_frames"):
+        if self._page_count is not None:
+            return self._page_count
+
+        if hasattr(self.im, "n_frames"):
+            # Pillow provides this attribute for all multi-frame formats
+            self._page_count = self.im.n_frames
+
+        elif hasattr(self.im, "num_frames"):
             # This attribute is available for some formats, like TIFF
-            return self.im.num_frames
+            self._page_count = self.im.num_frames
 
         else:
             # Count the number of pages manually
@@ -59,10 +85,27 @@ class PILMultiframeBackend(Backend):
 
             except (EOFError):
                 # We've seen every frame in the image
-                return pc
+                self._page_count = pc
+
+        return self._page_count
 
     def render_page(self, page_num):
         """Render the specified page of the input file."""
 
         self.im.seek(page_num - 1)
-        return self.im.copy()
+
+        # Work out which mode PIL.ImageTk will display this frame in
+        # Palette images are passed through as they are, since PIL.ImageTk
+        # applies their transparency (from GIF or PNG tRNS data) when it
+        # converts them, and converting them here would lose it.
+        mode = self.im.mode
+        if mode not in tk_modes and mode != "P":
+            mode = PIL.Image.getmodebase(mode)
+
+        if mode == self.im.mode:
+            return self.im.copy()
+
+        else:
+            # The frame would be converted for display anyway, so do that
+            # now instead of making a copy first
+            return self.im.convert(mode)
@@ -6,6 +6,7 @@ This is an internal API and subject to change at any time.
 import os
 import sys
 import subprocess
+import struct
 
 
 class Backend(object):
@@ -17,6 +18,14 @@ class Backend(object):
     Backends may optionally accept additional keyword arguments.
     Currently recognized keywords are:
 
+      canceler
+        A threading.Event that, if set, means rendering has been canceled.
+        Backends can use it to stop work in progress early.
+
+      color_mode
+        Color model for the Ghostscript and PDFium backends:
+        "rgb", "gray", or "mono".
+
       enable_downscaling
         Whether to enable downscaling in the Ghostscript backend.
 
@@ -35,6 +44,13 @@ class Backend(object):
         - PIL Image object
         - Tkinter PhotoImage object
         - Raw image data understood by PhotoImage
+
+    Backends that can render several pages more efficiently at once
+    may also override render_pages(pages), which is what the rendering
+    thread actually calls.
+
+    Backends can be used as context managers; temporary files are
+    removed on exit, or by calling close().
     """
 
     __slots__ = ["input_path", "temp_files"]
@@ -50,10 +66,35 @@ class Backend(object):
     def __del__(self):
         """Clean up before this backend is destroyed."""
 
-        # Clean up temporary files
-        for path in self.temp_files:
-            os.remove(path)
-            self.temp_files.remove(path)
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Clean up temporary files created by this backend.
+
+        This is called automatically when the backend is destroyed,
+        but calling it explicitly frees up disk space sooner.
+        """
+
+        # Removing items from a list while iterating over it skips
+        # every other item, so pop them off one at a time instead.
+        remaining = []
+        while self.temp_files:
+            path = self.temp_files.pop()
+            try:
+                os.remove(path)
+            except (OSError):
+                if os.path.exists(path):
+                    # Probably still open elsewhere on Windows;
+                    # try again when the backend is destroyed
+                    remaining.append(path)
+
+        self.temp_files = remaining
 
     def page_count(self):
         """Return the number of pages in the input file.
@@ -72,6 +113,17 @@ class Backend(object):
 
         raise NotImplementedError
 
+    def render_pages(self, pages):
+        """Render the specified pages of the input file, in order.
+
+        This is a generator yielding the result of render_page() for
+        each page in turn. Closing the generator stops any further
+        rendering. Override this if your backend can do better.
+        """
+
+        for page_num in pages:
+            yield self.render_page(page_num)
+
 
 class BackendError(Exception):
     """Exception representing an error in one of the rendering backends."""
@@ -81,9 +133,8 @@ class BackendError(Exception):
 def bytes_to_str(value):
     """Convert bytes to str."""
 
-    if isinstance(value, bytes) and not isinstance(value, str):
-        # Clumsy way to convert bytes to str on Python 3
-        return "".join(map(chr, value))
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", "replace")
 
     else:
         return value
@@ -95,21 +146,144 @@ def check_output(args):
     console window when running on Microsoft Windows.
     """
 
-    # Standard keyword arguments for subprocess.check_output()
-    subprocess_kw = {
-        "stdin": subprocess.PIPE,
-        "stderr": subprocess.PIPE,
-        "shell": False,
-    }
+    return subprocess.check_output(args, **_subprocess_kw())
+
+def popen(args, **kw):
+    """Run command with arguments and return a Popen object.
+
+    This is a wrapper for subprocess.Popen() that hides the console
+    window when running on Microsoft Windows. Keyword arguments are
+    forwarded to subprocess.Popen().
+    """
+
+    subprocess_kw = _subprocess_kw()
+    subprocess_kw.update(kw)
+    return subprocess.Popen(args, **subprocess_kw)
+
+def read_pnm(stream):
+    """Read a single binary PBM, PGM, or PPM image from a stream.
+
+    This is used to split the output of a program that writes several
+    images back-to-back, like Ghostscript rendering multiple pages to
+    stdout.
+
+    Returns the image data, or None if the stream was already at its end.
+    """
+
+    magic = stream.read(2)
+    if not magic:
+        return None
+    elif magic not in (b"P4", b"P5", b"P6"):
+        raise BackendError("Unrecognized image data.")
+
+    # Parse the header fields: width, height, and maximum value
+    # (except for PBM images, which don't have a maximum value)
+    header = bytearray(magic)
+    fields = []
+    field_count = 2 if magic == b"P4" else 3
+    token = b""
+
+    while len(fields) < field_count:
+        c = stream.read(1)
+        if not c:
+            raise BackendError("Image data ended unexpectedly.")
+        header += c
+
+        if c == b"#":
+            # Skip comments through the end of the line
+            header += stream.readline()
+
+        if c == b"#" or c.isspace():
+            if token:
+                fields.append(int(token))
+                token = b""
+        else:
+            token += c
+
+    # The header ends with the single whitespace character we just read
+    width, height = fields[:2]
+    if magic == b"P4":
+        size = (width + 7) // 8 * height
+    else:
+        size = width * height
+        if magic == b"P6":
+            size *= 3
+        if fields[2] > 255:
+            size *= 2
+
+    data = stream.read(size)
+    if len(data) < size:
+        raise BackendError("Image data ended unexpectedly.")
+
+    return bytes(header) + data
+
+def read_png(stream):
+    """Read a single PNG image from a stream.
+
+    Like read_pnm(), this is used to split the output of a program
+    that writes several images back-to-back.
+
+    Returns the image data, or None if the stream was already at its end.
+    """
+
+    signature = stream.read(8)
+    if not signature:
+        return None
+    elif signature != b"\x89PNG\r\n\x1a\n":
+        raise BackendError("Unrecognized image data.")
+
+    # Read chunks through the end-of-image chunk
+    chunks = [signature]
+    chunk_type = None
+
+    while chunk_type != b"IEND":
+        chunk_header = stream.read(8)
+        if len(chunk_header) < 8:
+            raise BackendError("Image data ended unexpectedly.")
+        length, chunk_type = struct.unpack(">I4s", chunk_header)
+
+        # Chunk data is followed by a four-byte CRC
+        chunk_body = stream.read(length + 4)
+        if len(chunk_body) < length + 4:
+            raise BackendError("Image data ended unexpectedly.")
+
+        chunks.append(chunk_header)
+        chunks.append(chunk_body)
+
+    return b"".join(chunks)
+
+def _subprocess_kw():
+    """Return standard keyword arguments for the subprocess module."""
+
+    # Callers may modify this, so always return a copy
+    subprocess_kw = dict(_base_subprocess_kw)
 
     if sys.platform.startswith("win"):
         # Hide the console window when running under pythonw.exe.
         # Note that a new STARTUPINFO object has to be created for
-        # each call to subprocess.check_output().
+        # each call to subprocess.check_output(), because Python
+        # versions before 3.7 modify it.
         gs_si = subprocess.STARTUPINFO()
         gs_si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
         gs_si.wShowWindow = subprocess.SW_HIDE
 
         subprocess_kw["startupinfo"] = gs_si
 
-    return subprocess.check_output(args, **subprocess_kw)
+    return subprocess_kw
+
+
+# Standard keyword arguments for subprocess.check_output()
+# These are the same for every call, so we only work them out once.
+_base_subprocess_kw = {
+    # Nothing we run reads from stdin, so don't bother with a pipe
+    "stdin": subprocess.DEVNULL,
+    "stderr": subprocess.PIPE,
+    "shell": False,
+}
+
+if not sys.platform.startswith("win"):
+    # File descriptors are no longer inherited by default (PEP 446),
+    # so it's safe to skip closing them in the child process. This
+    # also lets Python 3.8 and later launch it using posix_spawn(),
+    # which is faster than fork() and exec().
+    _base_subprocess_kw["close_fds"] = False
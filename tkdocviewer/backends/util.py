@@ -5,6 +5,14 @@ This is an internal API and subject to change at any time.
 
 import os
 import sys
+import fnmatch
+from shutil import which
+
+# How many levels of subdirectories to search for executables bundled
+# with an application. This is deep enough for layouts like gs/bin or
+# gs/gs9.27/bin, without crawling through everything else the
+# application might ship with (like a bundled Python environment).
+app_dir_depth = 3
 
 
 def find_executable(basenames, search_dirs=None):
@@ -18,7 +26,9 @@ def find_executable(basenames, search_dirs=None):
     appended automatically to basenames with no extension specified.
 
     If no search_dirs are specified, the default is to search all
-    directories in the system's $PATH.
+    directories in the system's $PATH. For a single basename, this uses
+    shutil.which(), which also checks that the file is actually
+    executable.
 
     Returns the full path to the executable if found, None otherwise.
     """
@@ -27,22 +37,88 @@ def find_executable(basenames, search_dirs=None):
         # Convert a single basename to a one-element list
         basenames = [basenames]
 
+    if not search_dirs and len(basenames) == 1:
+        # Search the system $PATH the standard way
+        # (Only for a single basename, to preserve our search order.)
+        return which(basenames[0])
+
     if not search_dirs:
         # Search the system $PATH
         search_dirs = os.getenv("PATH").split(os.pathsep)
 
-    for search_dir in search_dirs:
-        for basename in basenames:
-            # Ensure this is, in fact, a basename
-            basename = os.path.basename(basename)
+    # Ensure these are, in fact, basenames
+    basenames = [os.path.basename(basename) for basename in basenames]
 
-            # Append a file extension if necessary
-            if sys.platform.startswith("win"):
-                base, ext = os.path.splitext(basename)
-                if not ext:
-                    basename = "{0}.exe".format(basename)
+    # Append a file extension if necessary
+    if sys.platform.startswith("win"):
+        basenames = [basename if os.path.splitext(basename)[1]
+                     else "{0}.exe".format(basename)
+                     for basename in basenames]
 
+    for search_dir in search_dirs:
+        for basename in basenames:
             # Check if the candidate executable exists
             candidate = os.path.join(search_dir, basename)
             if os.path.isfile(candidate):
                 return candidate
+
+
+def find_dirs_containing(top, pattern, max_depth=None):
+    """Find directories under top containing a file matching pattern.
+
+    The pattern is a shell-style wildcard like "gswin??c.exe", and is
+    matched case-insensitively. The top directory itself is not included
+    in the search; only its subdirectories are. If max_depth is specified,
+    subdirectories nested more than that many levels deep are skipped.
+
+    This is a generator yielding the full path to each directory found.
+    Directories that can't be read are silently skipped.
+    """
+
+    pattern = pattern.lower()
+
+    # os.scandir() is much faster than os.walk() on Windows, because it
+    # returns file type information along with each directory entry
+
+    # Directories still to be searched
+    # Subdirectories are pushed in reverse order so pop() returns them
+    # in the same order os.walk() would.
+    stack = [(top, 0)]
+
+    while stack:
+        dirpath, depth = stack.pop()
+        subdirs = []
+        found = False
+
+        try:
+            for entry in os.scandir(dirpath):
+                if entry.is_dir(follow_symlinks=False):
+                    if max_depth is None or depth < max_depth:
+                        subdirs.append((entry.path, depth + 1))
+                elif not found and fnmatch.fnmatch(entry.name.lower(),
+                                                   pattern):
+                    found = True
+
+        except (OSError):
+            continue
+
+        if found and dirpath != top:
+            yield dirpath
+
+        stack.extend(reversed(subdirs))
+
+
+def version_tuple(version):
+    """Convert a version string like "9.27" to a tuple of integers.
+
+    This is useful for comparing version numbers. For example,
+    version_tuple("10.02.1") returns (10, 2, 1).
+    """
+
+    result = []
+    for component in version.split("."):
+        if not component.isdigit():
+            break
+        result.append(int(component))
+
+    return tuple(result)
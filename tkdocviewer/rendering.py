@@ -9,15 +9,28 @@ These are internal APIs and subject to change at any time.
 """
 
 import os
+import re
 import threading
+import queue
+
+# Monotonic clock for timeouts
+from time import monotonic
 
 from .backends import AutoBackend
 
 
-# On Python 2, basestring is the superclass for ASCII and Unicode strings.
-# On Python 3, all strings are Unicode and basestring is not defined.
-try: string_type = basestring
-except (NameError): string_type = str
+# Matches each item in a comma-separated list of pages, which can be a
+# single page number or a range of pages like "3-5". The special value
+# "end" refers to the last page. Malformed items don't match at all.
+page_list_item = re.compile(r"(?:^|,)(\d+|end)(?:-(\d+|end))?(?=,|$)")
+
+# Maximum number of items waiting in a rendering thread's queue
+# This leaves room for two pages, each preceded by a PageStarted message.
+queue_size = 4
+
+# How often a rendering thread waiting on a full queue checks whether
+# it has been canceled (in seconds)
+queue_poll_interval = 0.1
 
 
 class DocumentStarted(object):
@@ -44,6 +57,12 @@ class PageStarted(object):
     pass
 
 
+# These messages carry no information of their own, so rather than
+# creating new ones for every document and page, we reuse these
+document_started = DocumentStarted()
+page_started = PageStarted()
+
+
 class RenderingThread(threading.Thread):
     """Thread to run a rendering operation in the background.
 
@@ -96,35 +115,62 @@ class RenderingThread(threading.Thread):
 
         try:
             # Create a backend instance to render pages
-            self.backend = AutoBackend(self.path, **self.kw)
+            # The canceler lets it stop work in progress, too
+            self.backend = AutoBackend(self.path, canceler=self.canceler,
+                                       **self.kw)
 
             # Indicate rendering has started on the document
-            self.queue.put(DocumentStarted())
+            self._put(document_started)
 
             # Determine the page count
             page_count = self.backend.page_count()
-            self.queue.put(PageCount(page_count))
+            self._put(PageCount(page_count))
 
-            for page in self._parse_page_list(page_count):
-                if self.canceler.is_set():
-                    # Halt further processing
-                    break
+            # Let the backend render the pages however it sees fit;
+            # some backends can work on several pages at once
+            display_pages = self._parse_page_list(page_count)
+            rendered_pages = self.backend.render_pages(display_pages)
+
+            try:
+                if display_pages:
+                    # Indicate we have started rendering the first page
+                    self._put(page_started)
+
+                for page_index in range(1, len(display_pages) + 1):
+                    if self.canceler.is_set():
+                        # Halt further processing
+                        break
 
-                # Indicate we have started rendering the page
-                self.queue.put(PageStarted())
+                    # Retrieve the rendered page
+                    image_data = next(rendered_pages)
 
-                # Render the page
-                image_data = self.backend.render_page(page)
+                    # Pass the image data to the DocViewer widget, along
+                    # with word that we've started on the next page
+                    if page_index < len(display_pages):
+                        self._put(image_data, page_started)
+                    else:
+                        self._put(image_data)
 
-                # Pass the image data to the DocViewer widget
-                self.queue.put(image_data)
+            finally:
+                # Stop the backend from rendering any more pages
+                rendered_pages.close()
 
             # Signal we are done rendering this file
-            self.queue.put(None)
+            self._put_final(None)
 
         except (Exception) as err:
-            # Forward the error message to the UI thread
-            self._push_error(err)
+            if self.canceler.is_set():
+                # The backend was probably interrupted; that's not an error
+                self._put_final(None)
+            else:
+                # Forward the error message to the UI thread
+                self._push_error(err)
+
+        finally:
+            # Remove the backend's temporary files now
+            # rather than waiting for it to be garbage-collected
+            if self.backend:
+                self.backend.close()
 
     # ------------------------------------------------------------------------
 
@@ -134,6 +180,8 @@ class RenderingThread(threading.Thread):
         The page_count argument specifies the number of pages in the
         document. It was formerly calculated here, but is now calculated
         in run() so it can also be passed back to the UI thread.
+
+        Returns a list of page numbers, in the order to be displayed.
         """
 
         pages = self.pages
@@ -143,32 +191,31 @@ class RenderingThread(threading.Thread):
         # in case something goes weird within one of the if-clauses below.
         display_pages = range(1, page_count + 1)
 
-        if isinstance(pages, string_type):
+        if isinstance(pages, str):
             # Interpret a string as a list of pages
             display_pages = []
 
-            # Remove spaces from the list of pages, and replace the
-            # special value "end" with the number of the last page
-            pages = (pages.strip()
-                          .lower()
-                          .replace(" ", "")
-                          .replace("end", str(page_count)))
+            # Remove whitespace from the list of pages
+            pages = "".join(pages.lower().split())
 
             # Process this as a comma-separated list of individual
             # page numbers and/or ranges
-            for item in pages.split(","):
-                if item.isdigit():
-                    # This item is a single page number
-                    display_pages.append(int(item))
+            for match in page_list_item.finditer(pages):
+                # A single page number is a range of one page
+                start, end = match.group(1), match.group(2) or match.group(1)
+
+                # Replace the special value "end" with the last page number
+                start, end = [page_count if value == "end" else int(value)
+                              for value in (start, end)]
 
-                elif "-" in item:
-                    # This item appears to specify a range of pages
-                    try:
-                        start, end = map(int, item.split("-"))
-                        display_pages += range(start, end + 1)
+                # Clamp the range to the pages that actually exist, so a
+                # range like "1-999999" doesn't build a huge list only to
+                # throw most of it away
+                display_pages.extend(range(max(start, 1),
+                                           min(end, page_count) + 1))
 
-                    except (ValueError):
-                        pass
+            # Every page is already known to be valid
+            return display_pages
 
         elif isinstance(pages, int):
             # Single page number
@@ -180,12 +227,82 @@ class RenderingThread(threading.Thread):
             display_pages = pages
 
         # Return the pages to render, filtering out invalid page numbers
-        return filter(lambda page: 1 <= page <= page_count, display_pages)
+        return [page for page in display_pages if 1 <= page <= page_count]
+
+    def _put(self, *items):
+        """Put items onto the queue, waiting for room if necessary.
+
+        Several items are added at once if the queue supports it,
+        which saves on locking and waking up the UI thread.
+
+        If rendering is canceled while we're waiting, the items are
+        discarded, since nobody is going to display them. If the main
+        thread exits while we're waiting, rendering is canceled, so we
+        don't keep the interpreter from shutting down. Use _put_final()
+        for the last item, which must always be delivered.
+        """
+
+        if len(items) > 1 and hasattr(self.queue, "put_many"):
+            put, items = self.queue.put_many, [items]
+        else:
+            put = self.queue.put
+
+        for item in items:
+            while True:
+                try:
+                    put(item, timeout=queue_poll_interval)
+                    break
+
+                except (queue.Full):
+                    if self._abandoned():
+                        # Stop the backend, too
+                        self.canceler.set()
+
+                    if self.canceler.is_set():
+                        return
+
+    def _put_final(self, item):
+        """Put the last item for this file onto the queue.
+
+        The user interface waits for this item (None or an exception) to
+        know rendering has stopped, so unlike _put(), it isn't discarded
+        when rendering is canceled. Instead, any pages still in the queue
+        are thrown away to make room for it. It is only discarded if the
+        main thread has exited, since then nobody is left to retrieve it.
+        """
+
+        while True:
+            try:
+                self.queue.put(item, timeout=queue_poll_interval)
+                return
+
+            except (queue.Full):
+                if self._abandoned():
+                    # Nobody is left to retrieve it
+                    return
+
+                elif self.canceler.is_set():
+                    # Nobody is going to display these now
+                    while True:
+                        try:
+                            self.queue.get_nowait()
+                        except (queue.Empty):
+                            break
+
+    @staticmethod
+    def _abandoned():
+        """Return whether the user interface has gone away.
+
+        This happens if the main thread exits without canceling
+        rendering, like when an exception escapes the Tk mainloop.
+        """
+
+        return not threading.main_thread().is_alive()
 
     def _push_error(self, err):
         """Push an error message onto the queue."""
 
-        if isinstance(err, string_type):
+        if isinstance(err, str):
             # Process err as a string
             message = err
 
@@ -199,7 +316,53 @@ class RenderingThread(threading.Thread):
 
         # Put the exception into the queue and let DocViewer process it
         # in the main thread
-        self.queue.put(RenderingThreadError(message))
+        self._put_final(RenderingThreadError(message))
+
+
+class RenderingQueue(queue.Queue):
+    """Queue used to pass rendered pages back to the user interface.
+
+    This adds a put_many() method to put several items at once.
+    """
+
+    def put_many(self, items, block=True, timeout=None):
+        """Put a sequence of items into the queue at once.
+
+        This works like put(), except that it waits until there is room
+        for all the items. Raises queue.Full if there is never enough
+        room, like a bounded queue that is smaller than the sequence.
+        """
+
+        items = list(items)
+
+        with self.not_full:
+            if self.maxsize > 0:
+                if len(items) > self.maxsize:
+                    raise queue.Full
+
+                if not block:
+                    if self.maxsize - self._qsize() < len(items):
+                        raise queue.Full
+
+                elif timeout is None:
+                    while self.maxsize - self._qsize() < len(items):
+                        self.not_full.wait()
+
+                elif timeout < 0:
+                    raise ValueError("'timeout' must be a non-negative number")
+
+                else:
+                    deadline = monotonic() + timeout
+                    while self.maxsize - self._qsize() < len(items):
+                        remaining = deadline - monotonic()
+                        if remaining <= 0:
+                            raise queue.Full
+                        self.not_full.wait(remaining)
+
+            for item in items:
+                self._put(item)
+            self.unfinished_tasks += len(items)
+            self.not_empty.notify()
 
 
 class RenderingThreadError(Exception):
@@ -2,22 +2,47 @@
 
 This module contains various test cases for the DocViewer widget.
 At the moment these are mainly focused on testing file format support.
+The remaining test cases cover the rendering internals, and don't
+need a display or any external programs.
 
 Note: The file format tests assume you have all dependencies installed.
 """
 
 import os
 import sys
+import io
+import queue
+import shutil
+import struct
+import tempfile
+import threading
+import time
 import unittest
+import zlib
+from unittest import mock
+
+import tkinter as tk
 
 try:
-    # Python 3
-    import tkinter as tk
+    import PIL.Image
 except (ImportError):
-    # Python 2
-    import Tkinter as tk
+    PIL = None
+
+try:
+    import numpy
+except (ImportError):
+    numpy = None
 
 from . import DocViewer
+from .backends import (AutoBackend, BACKEND_DOC_EXTENSIONS,
+                       BACKEND_IMAGE_EXTENSIONS, BackendError,
+                       BACKENDS_BY_EXTENSION, ghostscript, GhostscriptBackend,
+                       PdfiumBackend, PILImageBackend, PILMultiframeBackend,
+                       pypdfium2)
+from .backends.cache import PageCache
+from .backends.shared import read_png, read_pnm
+from .backends.util import find_dirs_containing, find_executable, version_tuple
+from .rendering import RenderingQueue, RenderingThread, RenderingThreadError
 
 
 # Absolute path to this file
@@ -214,3 +239,672 @@ class DocViewerTest(unittest.TestCase):
             "" if self.viewer.page_count == 1 else "s"
         )
         self.status.configure(text=status_text)
+
+
+
+class StreamSplittingTest(unittest.TestCase):
+    """Test case for splitting back-to-back images out of a stream."""
+
+    def test_read_pnm(self):
+        """Test reading PBM, PGM, and PPM images from a stream."""
+
+        images = [b"P4\n9 2\n" + b"\xff" * 4,
+                  b"P5\n# comment\n2 2\n255\n" + b"\x01" * 4,
+                  b"P6 2 1 255 " + b"\x02" * 6,
+                  b"P5\n1 1\n65535\n" + b"\x03" * 2]
+        stream = io.BytesIO(b"".join(images))
+
+        for image in images:
+            self.assertEqual(read_pnm(stream), image)
+        self.assertIsNone(read_pnm(stream))
+
+    def test_read_pnm_errors(self):
+        """Test reading malformed and truncated PNM images."""
+
+        self.assertRaises(BackendError, read_pnm, io.BytesIO(b"P3 1 1 255"))
+        self.assertRaises(BackendError, read_pnm,
+                          io.BytesIO(b"P6 2 2 255 " + b"\x00" * 11))
+
+    def test_read_png(self):
+        """Test reading PNG images from a stream."""
+
+        images = [self._png_data(b"first"), self._png_data(b"second")]
+        stream = io.BytesIO(b"".join(images))
+
+        for image in images:
+            self.assertEqual(read_png(stream), image)
+        self.assertIsNone(read_png(stream))
+
+    def test_read_png_errors(self):
+        """Test reading malformed and truncated PNG images."""
+
+        png_data = self._png_data(b"data")
+        self.assertRaises(BackendError, read_png, io.BytesIO(b"GIF89a.."))
+        self.assertRaises(BackendError, read_png, io.BytesIO(png_data[:-1]))
+
+    @staticmethod
+    def _png_data(payload):
+        """Return the chunk structure of a PNG image carrying payload.
+
+        Only the chunk boundaries matter to read_png(), so this isn't
+        a valid image.
+        """
+
+        def chunk(chunk_type, data):
+            return (struct.pack(">I4s", len(data), chunk_type) + data
+                    + struct.pack(">I", zlib.crc32(chunk_type + data)))
+
+        return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", payload)
+                + chunk(b"IEND", b""))
+
+
+
+class PageCacheTest(unittest.TestCase):
+    """Test case for the page cache."""
+
+    def test_lru_eviction(self):
+        """Test that the least recently used values are evicted first."""
+
+        cache = PageCache(10)
+        cache.put("a", b"1234")
+        cache.put("b", b"1234")
+        cache.get("a")
+        cache.put("c", b"1234")
+
+        self.assertEqual(cache.get("a"), b"1234")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), b"1234")
+        self.assertEqual(cache.size, 8)
+
+    def test_size_limit(self):
+        """Test that the cache counts bytes and skips oversized values."""
+
+        cache = PageCache(10)
+        cache.put("a", b"12345678")
+        cache.put("a", b"123")
+        self.assertEqual(cache.size, 3)
+
+        cache.put("b", b"12345678901")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), b"123")
+
+        cache.put("c", 42)
+        self.assertEqual(cache.size, 4)
+
+    @unittest.skipUnless(PIL, "requires PIL")
+    def test_image_size(self):
+        """Test that PIL images are sized by their pixel data."""
+
+        cache = PageCache(1000)
+        cache.put("a", PIL.Image.new("RGB", (10, 10)))
+        self.assertEqual(cache.size, 300)
+
+
+
+class RenderingQueueTest(unittest.TestCase):
+    """Test case for putting several items on the queue at once."""
+
+    def test_put_many(self):
+        """Test that put_many() waits for room for every item."""
+
+        q = RenderingQueue(maxsize=3)
+        q.put("a")
+        q.put_many(["b", "c"])
+        self.assertRaises(queue.Full, q.put_many, ["d"], block=False)
+        self.assertRaises(queue.Full, q.put_many, ["d"], timeout=0.01)
+
+        q.get()
+        self.assertRaises(queue.Full, q.put_many, ["d", "e"], timeout=0.01)
+        q.put_many(["d"], timeout=0.01)
+        self.assertEqual([q.get() for i in range(3)], ["b", "c", "d"])
+
+    def test_put_many_too_large(self):
+        """Test putting more items than the queue can ever hold."""
+
+        q = RenderingQueue(maxsize=2)
+        self.assertRaises(queue.Full, q.put_many, ["a", "b", "c"])
+
+
+
+class PageListTest(unittest.TestCase):
+    """Test case for parsing the list of pages to render."""
+
+    def test_page_list(self):
+        """Test parsing page lists."""
+
+        self.assertEqual(self._parse(None, 3), [1, 2, 3])
+        self.assertEqual(self._parse(4), [4])
+        self.assertEqual(self._parse(11), [])
+        self.assertEqual(self._parse([3, 0, 1, 12]), [3, 1])
+        self.assertEqual(self._parse("1, 3-5, end"), [1, 3, 4, 5, 10])
+        self.assertEqual(self._parse("8-end,x,2-"), [8, 9, 10])
+
+    def test_page_range_clamping(self):
+        """Test that page ranges are clamped to the document."""
+
+        self.assertEqual(self._parse("0-2,9-999999"), [1, 2, 9, 10])
+        self.assertEqual(self._parse("12-20"), [])
+
+    @staticmethod
+    def _parse(pages, page_count=10):
+        """Return the pages a rendering thread would render."""
+
+        rt = RenderingThread(None, None, None, pages)
+        return list(rt._parse_page_list(page_count))
+
+
+
+class RenderingThreadTest(unittest.TestCase):
+    """Test case for the rendering thread."""
+
+    def test_cancel_with_full_queue(self):
+        """Test that the final item arrives after canceling.
+
+        The widget waits for this item after canceling rendering, so
+        losing it would hang the user interface.
+        """
+
+        q = RenderingQueue(maxsize=2)
+        canceler = threading.Event()
+        q.put_many(["page 1", "page 2"])
+
+        rt = RenderingThread(q, canceler, get_sample_file("missing.pdf"))
+        canceler.set()
+        rt.start()
+
+        # Don't drain the queue until the thread gives up waiting
+        time.sleep(0.35)
+        rt.join(5)
+        self.assertFalse(rt.is_alive())
+
+        items = []
+        while not q.empty():
+            items.append(q.get_nowait())
+        self.assertEqual(len(items), 1)
+        self.assertIsInstance(items[0], RenderingThreadError)
+
+
+
+class BackendRegistryTest(unittest.TestCase):
+    """Test case for choosing a backend by file extension."""
+
+    def test_extension_lists(self):
+        """Test that the public extension lists are still lists."""
+
+        self.assertIsInstance(BACKEND_DOC_EXTENSIONS, list)
+        self.assertIsInstance(BACKEND_IMAGE_EXTENSIONS, list)
+
+        known_extensions = DocViewer.known_extensions
+        self.assertEqual(len(known_extensions), len(set(known_extensions)))
+        self.assertIn(".pdf", known_extensions)
+        self.assertIn(".png", known_extensions)
+
+    def test_extension_lookup(self):
+        """Test that only the extension is matched, case-insensitively."""
+
+        class DummyBackend(object):
+            def __init__(self, input_path, **kw):
+                self.input_path = input_path
+
+        with mock.patch.dict(BACKENDS_BY_EXTENSION, {".xyz": DummyBackend}):
+            for path in ("file.xyz", "FILE.XYZ",
+                         os.path.join("DIR.ABC", "file.Xyz")):
+                self.assertIsInstance(AutoBackend(path), DummyBackend)
+
+            self.assertRaises(BackendError, AutoBackend, "file.abc")
+            self.assertRaises(BackendError, AutoBackend,
+                              os.path.join("dir.xyz", "file"))
+
+
+
+class UtilTest(unittest.TestCase):
+    """Test case for the backend utility functions."""
+
+    def test_version_tuple(self):
+        """Test converting version strings for comparison."""
+
+        self.assertEqual(version_tuple("9.27"), (9, 27))
+        self.assertEqual(version_tuple("10.02.1"), (10, 2, 1))
+        self.assertGreater(version_tuple("10.0"), version_tuple("9.50"))
+
+    @unittest.skipIf(sys.platform.startswith("win"),
+                     "requires Unix file permissions")
+    def test_find_executable(self):
+        """Test searching $PATH for an executable."""
+
+        search_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, search_dir)
+
+        for basename, mode in (("tool", 0o755), ("data", 0o644)):
+            path = os.path.join(search_dir, basename)
+            with open(path, "w"):
+                pass
+            os.chmod(path, mode)
+
+        with mock.patch.dict(os.environ, {"PATH": search_dir}):
+            # A single basename is found using shutil.which(), which
+            # skips files we can't actually run
+            self.assertEqual(find_executable("tool"),
+                             os.path.join(search_dir, "tool"))
+            self.assertIsNone(find_executable("data"))
+
+            # Several basenames are searched for by hand, in order
+            self.assertEqual(find_executable(["missing", "data", "tool"]),
+                             os.path.join(search_dir, "data"))
+
+
+
+class FindDirsTest(unittest.TestCase):
+    """Test case for finding directories containing a file."""
+
+    def setUp(self):
+        """Set up the test case."""
+
+        self.top = tempfile.mkdtemp()
+        for subdir in ("a", os.path.join("b", "c"),
+                       os.path.join("b", "c", "d", "e")):
+            os.makedirs(os.path.join(self.top, subdir))
+            with open(os.path.join(self.top, subdir, "GS.EXE"), "w"):
+                pass
+
+        # Files in the top directory itself don't count
+        with open(os.path.join(self.top, "gs.exe"), "w"):
+            pass
+
+    def tearDown(self):
+        """Clean up the test case."""
+
+        shutil.rmtree(self.top)
+
+    def test_max_depth(self):
+        """Test limiting how far the search descends."""
+
+        def found(max_depth):
+            return sorted(os.path.relpath(path, self.top) for path
+                          in find_dirs_containing(self.top, "gs.exe",
+                                                  max_depth))
+
+        deep = os.path.join("b", "c", "d", "e")
+        self.assertEqual(found(None), ["a", os.path.join("b", "c"), deep])
+        self.assertEqual(found(2), ["a", os.path.join("b", "c")])
+        self.assertEqual(found(1), ["a"])
+
+
+
+def ppm_page(pixels, width=4):
+    """Return a raw PPM page the way Ghostscript writes it.
+
+    The pixels argument is a list of gray levels, in rows of the given
+    width. The page number is a convenient value to fill a page with.
+    """
+
+    return (b"P6\n"
+            b"# Image generated by GPL Ghostscript (device=ppmraw)\n"
+            + "{0} {1}\n255\n".format(width,
+                                      len(pixels) // width).encode("ascii")
+            + b"".join(bytes([value]) * 3 for value in pixels))
+
+
+class FakeGhostscript(object):
+    """Stand-in for a Ghostscript process writing raw PPM pages.
+
+    Each page is filled with its page number. If page_limit is set,
+    only that many pages are written, as if Ghostscript had stopped
+    early.
+    """
+
+    def __init__(self, args, page_limit=None):
+        self.args = args
+
+        pages = []
+        for arg in args:
+            if arg.startswith("-dFirstPage="):
+                first_page = int(arg.split("=")[1])
+            elif arg.startswith("-dLastPage="):
+                pages = range(first_page, int(arg.split("=")[1]) + 1)
+            elif arg.startswith("-sPageList="):
+                pages = [int(page_num)
+                         for page_num in arg.split("=")[1].split(",")]
+
+        pages = list(pages)[:page_limit]
+        self.stdout = io.BytesIO(b"".join(ppm_page([page_num] * 8)
+                                          for page_num in pages))
+        self.returncode = None
+
+    def kill(self):
+        self.returncode = -9
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self):
+        if self.returncode is None:
+            self.returncode = 0
+        return self.returncode
+
+
+
+class GhostscriptTest(unittest.TestCase):
+    """Test case for the Ghostscript backend.
+
+    Ghostscript itself is replaced by FakeGhostscript, so these tests
+    don't need it installed.
+    """
+
+    def setUp(self):
+        """Set up the test case."""
+
+        # Pretend we found a recent version of Ghostscript
+        ghostscript.find_ghostscript()
+        patcher = mock.patch.multiple(ghostscript,
+                                      gs_exe="gs",
+                                      gs_version="9.50",
+                                      gs_page_list=True,
+                                      gs_downscale=True,
+                                      popen=self._popen)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Ghostscript processes started, and how many pages they render
+        self.processes = []
+        self.page_limit = None
+
+        # This doesn't exist, so nothing is taken from the page cache
+        self.pdf_path = get_sample_file("missing.pdf")
+
+    def _popen(self, args, **kw):
+        """Start a fake Ghostscript process."""
+
+        proc = FakeGhostscript(args, self.page_limit)
+        self.processes.append(proc)
+        return proc
+
+    def _temp_file(self, suffix, data):
+        """Return the path to a temporary file containing data."""
+
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, "wb") as temp_file:
+            temp_file.write(data)
+
+        self.addCleanup(os.remove, path)
+        return path
+
+    @staticmethod
+    def _page_num(image_data):
+        """Return the page number a rendered page is filled with."""
+
+        if hasattr(image_data, "getpixel"):
+            return image_data.getpixel((0, 0))[0]
+        else:
+            return image_data[-1]
+
+    def test_render_order(self):
+        """Test that pages come back in the order requested."""
+
+        backend = GhostscriptBackend(self.pdf_path)
+        pages = [3, 1, 2, 5, 4, 6, 7, 8, 9, 2]
+
+        for cpu_count in (1, 4):
+            with mock.patch("os.cpu_count", return_value=cpu_count):
+                rendered = list(backend._render_uncached(pages))
+            self.assertEqual(list(map(self._page_num, rendered)), pages)
+
+    def test_batch_pages(self):
+        """Test dividing pages into batches for one Ghostscript run each."""
+
+        backend = GhostscriptBackend(self.pdf_path)
+        pages = [1, 2, 3, 5, 4, 6]
+
+        self.assertEqual(backend._batch_pages(pages, 3),
+                         [[1, 2, 3], [5], [4, 6]])
+        self.assertEqual(backend._batch_pages(pages, 8),
+                         [[1, 2, 3, 5], [4, 6]])
+
+        with mock.patch.object(ghostscript, "gs_page_list", False):
+            self.assertEqual(backend._batch_pages(pages, 8),
+                             [[1, 2, 3], [5], [4], [6]])
+
+    def test_page_list_args(self):
+        """Test rendering a batch of pages in one pass with -sPageList."""
+
+        backend = GhostscriptBackend(self.pdf_path)
+        rendered = list(backend._render_batch([2, 5, 6]))
+
+        self.assertEqual(list(map(self._page_num, rendered)), [2, 5, 6])
+        self.assertEqual(len(self.processes), 1)
+        self.assertIn("-sPageList=2,5,6", self.processes[0].args)
+
+    def test_ppm_header(self):
+        """Test matching raw PPM headers written by Ghostscript."""
+
+        match = ghostscript.ppm_header.match(ppm_page([7] * 8))
+        self.assertEqual(match.group(1, 2, 3), (b"P6", b"4", b"2"))
+
+    @unittest.skipUnless(PIL and numpy, "requires PIL and numpy")
+    def test_reduce_with_numpy(self):
+        """Test averaging 2x2 blocks of pixels using numpy."""
+
+        backend = GhostscriptBackend(self.pdf_path, enable_downscaling=True)
+        image_data = ppm_page([0, 2, 4, 6,
+                               2, 4, 6, 8])
+
+        # Hide Image.reduce() so numpy is used instead
+        reduce = PIL.Image.Image.reduce
+        del PIL.Image.Image.reduce
+        try:
+            page_image = backend._reduce_page(image_data)
+        finally:
+            PIL.Image.Image.reduce = reduce
+
+        self.assertEqual(page_image.size, (2, 1))
+        self.assertEqual(page_image.getpixel((0, 0)), (2, 2, 2))
+        self.assertEqual(page_image.getpixel((1, 0)), (6, 6, 6))
+
+    def test_close_early(self):
+        """Test that closing the page generator stops Ghostscript."""
+
+        rendered = GhostscriptBackend(self.pdf_path)._render_batch([1, 2, 3])
+        next(rendered)
+        rendered.close()
+
+        proc = self.processes[-1]
+        self.assertTrue(proc.stdout.closed)
+        self.assertEqual(proc.returncode, -9)
+
+    def test_stopped_early(self):
+        """Test that missing pages are reported as an error."""
+
+        self.page_limit = 1
+        rendered = GhostscriptBackend(self.pdf_path)._render_batch([1, 2])
+        next(rendered)
+        self.assertRaises(BackendError, next, rendered)
+
+    def test_page_range_args(self):
+        """Test rendering a contiguous range of pages in one pass."""
+
+        backend = GhostscriptBackend(self.pdf_path)
+        with mock.patch.object(ghostscript, "gs_page_list", False), \
+                mock.patch("os.cpu_count", return_value=1):
+            rendered = list(backend._render_uncached([4, 5, 6]))
+
+        self.assertEqual(list(map(self._page_num, rendered)), [4, 5, 6])
+        self.assertEqual(len(self.processes), 1)
+        self.assertIn("-dFirstPage=4", self.processes[0].args)
+        self.assertIn("-dLastPage=6", self.processes[0].args)
+
+    def test_dsc_page_count(self):
+        """Test reading the page count from Postscript DSC comments."""
+
+        for comments, page_count in (
+                (b"%%Pages: 3\n", 3),
+                (b"%%Pages: (atend)\n%%Trailer\n%%Pages: 5\n", 5),
+                (b"%%Pages: (atend)\n", None),
+                (b"%%Pages: 0\n", None),
+                (b"", None)):
+            ps_path = self._temp_file(".ps", b"%!PS-Adobe-3.0\n" + comments
+                                      + b"%%EOF\n")
+            backend = GhostscriptBackend(ps_path)
+            self.assertEqual(backend._dsc_page_count(), page_count)
+
+    @unittest.skipUnless(PIL, "requires PIL")
+    def test_ppm_to_image(self):
+        """Test wrapping raw pages in PIL images."""
+
+        page_image = GhostscriptBackend._ppm_to_image(ppm_page([7] * 8))
+        self.assertEqual(page_image.mode, "RGB")
+        self.assertEqual(page_image.size, (4, 2))
+        self.assertEqual(page_image.getpixel((3, 1)), (7, 7, 7))
+
+        pgm_data = b"P5\n# comment\n2 1\n255\n\x01\x02"
+        page_image = GhostscriptBackend._ppm_to_image(pgm_data)
+        self.assertEqual(page_image.mode, "L")
+        self.assertEqual(page_image.tobytes(), b"\x01\x02")
+
+    @unittest.skipUnless(PIL and hasattr(PIL.Image.Image, "reduce"),
+                         "requires Pillow 7.0 or later")
+    def test_reduce(self):
+        """Test averaging 2x2 blocks of pixels using Image.reduce()."""
+
+        backend = GhostscriptBackend(self.pdf_path, enable_downscaling=True)
+        page_image = backend._reduce_page(ppm_page([0, 2, 4, 6,
+                                                    2, 4, 6, 8]))
+
+        self.assertEqual(page_image.size, (2, 1))
+        self.assertEqual(page_image.getpixel((0, 0)), (2, 2, 2))
+        self.assertEqual(page_image.getpixel((1, 0)), (6, 6, 6))
+
+    def test_ps_conversions(self):
+        """Test reusing PDF conversions of a Postscript file."""
+
+        ps_path = self._temp_file(".ps", b"%!PS\nshowpage\n")
+        conversions = []
+
+        def render_to_pdf(backend, output_path):
+            conversions.append(output_path)
+            with open(output_path, "wb") as pdf_file:
+                pdf_file.write(b"%PDF-1.4\n")
+
+        self.addCleanup(ghostscript._remove_ps_conversions)
+        with mock.patch.object(GhostscriptBackend, "render_to_pdf",
+                               render_to_pdf):
+            first = GhostscriptBackend(ps_path)
+            first._convert_to_pdf()
+            second = GhostscriptBackend(ps_path)
+            second._convert_to_pdf()
+
+            self.assertEqual(second.input_path, first.input_path)
+            self.assertEqual(len(conversions), 1)
+
+            # Changing the file makes the old conversion useless
+            st = os.stat(ps_path)
+            os.utime(ps_path, (st.st_atime, st.st_mtime + 10))
+            third = GhostscriptBackend(ps_path)
+            third._convert_to_pdf()
+
+        self.assertEqual(len(conversions), 2)
+        self.assertEqual(third.input_path, conversions[1])
+        self.assertFalse(os.path.exists(conversions[0]))
+
+    def test_color_mode_devices(self):
+        """Test choosing Ghostscript's output device for each color mode."""
+
+        # Ghostscript only downscales its own output for some devices
+        for color_mode, enable_downscaling, gs_downscale, device in (
+                ("rgb", False, True, "ppmraw"),
+                ("gray", False, True, "pgmraw"),
+                ("mono", False, True, "pgmraw"),
+                ("rgb", True, True, "png16m"),
+                ("gray", True, True, "pnggray"),
+                ("mono", True, True, "pngmonod"),
+                ("mono", True, False, "pgmraw")):
+            with mock.patch.object(ghostscript, "gs_downscale",
+                                   gs_downscale):
+                backend = GhostscriptBackend(
+                    self.pdf_path, color_mode=color_mode,
+                    enable_downscaling=enable_downscaling)
+            args = backend._render_args()
+
+            self.assertIn("-sDEVICE={0}".format(device), args)
+            self.assertEqual("-dDownScaleFactor=2" in args,
+                             enable_downscaling and gs_downscale)
+
+    def test_cancel(self):
+        """Test that canceling stops rendering without an error."""
+
+        canceler = threading.Event()
+        backend = GhostscriptBackend(self.pdf_path, canceler=canceler)
+
+        # Ghostscript is killed after the first page
+        self.page_limit = 1
+        rendered = backend._render_batch([1, 2, 3])
+        next(rendered)
+        canceler.set()
+
+        self.assertEqual(list(rendered), [])
+
+
+
+@unittest.skipUnless(PIL, "requires PIL")
+class PILBackendTest(unittest.TestCase):
+    """Test case for the PIL image backends."""
+
+    def test_close(self):
+        """Test that closing a backend closes its input file."""
+
+        backend = PILMultiframeBackend(
+            get_sample_file("Rotating_earth_(large).gif"))
+        input_file = backend.im.fp
+        backend.close()
+
+        self.assertTrue(input_file.closed)
+        self.assertIsNone(backend.im)
+
+    def test_transparency(self):
+        """Test that palette images keep their transparency."""
+
+        fd, path = tempfile.mkstemp(suffix=".png")
+        os.close(fd)
+
+        try:
+            image = PIL.Image.new("P", (2, 2))
+            image.putpalette([255, 0, 0] * 256)
+            image.save(path, transparency=0)
+
+            with PILImageBackend(path) as backend:
+                page_image = backend.render_page(1)
+                self.assertEqual(page_image.convert("RGBA").getpixel((0, 0)),
+                                 (255, 0, 0, 0))
+
+        finally:
+            os.remove(path)
+
+    def test_image(self):
+        """Test rendering a single-frame image."""
+
+        with PILImageBackend(get_sample_file("cover.png")) as backend:
+            self.assertEqual(backend.page_count(), 1)
+            page_image, = backend.render_pages([1])
+            self.assertEqual(page_image.size, backend.im.size)
+
+
+
+@unittest.skipUnless(pypdfium2, "requires pypdfium2")
+class PdfiumBackendTest(unittest.TestCase):
+    """Test case for the PDFium backend."""
+
+    def test_color_modes(self):
+        """Test rendering in each color mode."""
+
+        path = get_sample_file("backends.ghostscript.pdf")
+        for color_mode in ("rgb", "gray", "mono"):
+            with PdfiumBackend(path, color_mode=color_mode) as backend:
+                self.assertEqual(backend.page_count(), 6)
+                pages = list(backend.render_pages([2, 1]))
+                self.assertEqual(len(pages), 2)
+
+    def test_bad_color_mode(self):
+        """Test that unknown color modes are rejected."""
+
+        self.assertRaises(BackendError, PdfiumBackend,
+                          get_sample_file("backends.ghostscript.pdf"),
+                          color_mode="cmyk")
@@ -3,32 +3,14 @@
 import os
 import sys
 import threading
-import gc
+import queue
+import tkinter as tk
 
 try:
-    # Python 3
-    import queue
-except (ImportError):
-    # Python 2
-    import Queue as queue
-
-try:
-    # Python 3
-    import tkinter as tk
-except (ImportError):
-    # Python 2
-    import Tkinter as tk
-
-try:
-    try:
-        # Python 3
-        import tkinter.ttk as ttk
-    except (ImportError):
-        # Python 2
-        import ttk
+    import tkinter.ttk as ttk
 except (ImportError):
     # Can't provide ttk's Scrollbar
-    pass
+    ttk = None
 
 try:
     import PIL.Image
@@ -40,18 +22,23 @@ from .backends import (BACKEND_DOC_EXTENSIONS,
                        BACKEND_IMAGE_EXTENSIONS,
                        BACKENDS_BY_EXTENSION,
                        GhostscriptBackend, gs_dpi)
-from .rendering import DocumentStarted, PageCount, PageStarted, RenderingThread
+from .rendering import (DocumentStarted, PageCount, PageStarted,
+                        RenderingQueue, RenderingThread, queue_size)
 
 
 __all__ = ["DocViewer"]
 
 
-class DocViewer(tk.Frame, object):
+class DocViewer(tk.Frame):
     """Document viewer widget.
 
     The constructor accepts the usual Tkinter keyword arguments, plus
     a handful of its own:
 
+      color_mode (str; default: "rgb")
+        Color model for PDF documents: "rgb", "gray", or "mono".
+        See the help text for the color_mode property.
+
       enable_downscaling (bool; default: False)
         Enables downscaling for PDF documents. Not usually needed.
         See the help text for the enable_downscaling property.
@@ -95,9 +82,6 @@ class DocViewer(tk.Frame, object):
         An error occurred while rendering a document.
     """
 
-    # Note we explicitly inherit from object because Tkinter on Python 2
-    # uses old-style classes.
-
     def __init__(self, master=None, **kw):
         """Return a new DocViewer widget."""
 
@@ -117,7 +101,7 @@ class DocViewer(tk.Frame, object):
         # Watch this with wait_variable() if you need to do anything
         # to the displayed file after it's been rendered.
         self._rendering = tk.BooleanVar()
-        self._rendering.set(0)
+        self._rendering.set(False)
 
         # Storage for rendered pages
         self._rendered_pages = []
@@ -130,13 +114,24 @@ class DocViewer(tk.Frame, object):
         # Used in self._process_queue()
         self._y_offset = 0
 
+        # Width of the widest page on the canvas
+        self._max_page_width = 0
+
+        # Color model for PDF files
+        self._color_mode = tk.StringVar()
+        if "color_mode" in kw:
+            self._color_mode.set(kw["color_mode"])
+            del kw["color_mode"]
+        else:
+            self._color_mode.set("rgb")
+
         # Whether to enable downscaling for PDF files
         self._enable_downscaling = tk.BooleanVar()
         if "enable_downscaling" in kw:
             self._enable_downscaling.set(kw["enable_downscaling"])
             del kw["enable_downscaling"]
         else:
-            self._enable_downscaling.set(0)
+            self._enable_downscaling.set(False)
 
         # Whether to force unrecognized file types to display as plain text
         self._force_text_display = tk.BooleanVar()
@@ -144,7 +139,7 @@ class DocViewer(tk.Frame, object):
             self._force_text_display.set(kw["force_text_display"])
             del kw["force_text_display"]
         else:
-            self._force_text_display.set(0)
+            self._force_text_display.set(False)
 
         # Which scrollbars to provide
         if "scrollbars" in kw:
@@ -183,7 +178,7 @@ class DocViewer(tk.Frame, object):
             self._wrap_text.set(kw["wrap_text"])
             del kw["wrap_text"]
         else:
-            self._wrap_text.set(1)
+            self._wrap_text.set(True)
 
         # The default appearance has a 1px border with sunken relief
         if not "relief" in kw:
@@ -225,7 +220,10 @@ class DocViewer(tk.Frame, object):
         self.bind_scroll_wheel(c)
 
         # Re-display text when the canvas is resized
-        c.bind("<Configure>", self.refresh)
+        # Resizing the window generates a burst of these events, so they're
+        # handled once Tk is idle rather than one at a time.
+        self._refresh_pending = None
+        c.bind("<Configure>", self._schedule_refresh)
 
         # Process our remaining configuration options
         self.configure(**kw)
@@ -268,7 +266,7 @@ class DocViewer(tk.Frame, object):
     def can_display(self, path):
         """Return whether this widget can display the specified file."""
 
-        base, ext = map(str.lower, os.path.splitext(path))
+        ext = os.path.splitext(path)[1].lower()
         return (ext in self.known_extensions or self._force_text_display.get())
 
     def cancel_rendering(self, event=None):
@@ -297,14 +295,26 @@ class DocViewer(tk.Frame, object):
     def configure(self, cnf=None, **kw):
         """Configure resources of a widget."""
 
-        # This is overridden so we can use our custom __setitem__()
-        # to pass certain options directly to the canvas.
+        # This is overridden so we can pass certain options directly
+        # to the canvas. Options are sorted out first so each widget is
+        # only reconfigured once.
         if cnf:
-            for key in cnf:
-                self[key] = cnf[key]
+            cnf = dict(cnf)
+            cnf.update(kw)
+            kw = cnf
 
+        canvas_kw = {}
+        frame_kw = {}
         for key in kw:
-            self[key] = kw[key]
+            if key in self._CANVAS_KEYS:
+                canvas_kw[key] = kw[key]
+            else:
+                frame_kw[key] = kw[key]
+
+        if canvas_kw:
+            self._canvas.configure(**canvas_kw)
+        if frame_kw:
+            tk.Frame.configure(self, **frame_kw)
 
     # Also override this alias for configure()
     config = configure
@@ -314,6 +324,9 @@ class DocViewer(tk.Frame, object):
         """Destroy this and all descendants widgets."""
 
         self.cancel_rendering()
+        if self._refresh_pending:
+            self.after_cancel(self._refresh_pending)
+            self._refresh_pending = None
         return tk.Frame.destroy(self)
 
     def display_file(self, path, pages=None):
@@ -335,9 +348,9 @@ class DocViewer(tk.Frame, object):
         self.erase()
 
         # Determine how to render the file based on its extension
-        base, ext = map(str.lower, os.path.splitext(path))
+        ext = os.path.splitext(path)[1].lower()
 
-        if ext in BACKENDS_BY_EXTENSION.keys():
+        if ext in BACKENDS_BY_EXTENSION:
             # File format supported by one of our backends
             self._start_rendering_thread(path, pages)
 
@@ -391,9 +404,13 @@ class DocViewer(tk.Frame, object):
 
         # Blank the canvas
         c.delete("all")
+        c.configure(scrollregion="")
         self._y_offset = 0
+        self._max_page_width = 0
 
         # Delete rendered pages from memory
+        # They're only referenced from this list, so they're freed right
+        # away without needing a full garbage collection.
         del self._rendered_pages[:]
 
         # Forget the currently displayed file path and pages
@@ -404,10 +421,6 @@ class DocViewer(tk.Frame, object):
         self._page_count = 1
         self._rendered_page_count = 0
 
-        if gc.isenabled():
-            # Call the garbage collector to free unused memory
-            gc.collect()
-
     def fit_page(self, width, height=None):
         """Resize the widget to fit a page of the specified dimensions.
 
@@ -430,6 +443,11 @@ class DocViewer(tk.Frame, object):
 
         c = self._canvas
 
+        if not c.find_withtag("message"):
+            # Only text needs refreshing; the scroll region is updated
+            # as each page is added to the canvas
+            return
+
         if self._wrap_text.get():
             # Wrap the text to fit the canvas widget
             text_width = c.winfo_width() - self._TEXT_X_MARGIN
@@ -482,7 +500,12 @@ class DocViewer(tk.Frame, object):
                        image=page_image, tags="page_image")
 
         # Update the canvas's scroll region
-        c.configure(scrollregion=c.bbox("all"))
+        # Pages are stacked from the top-left corner, so we can work this
+        # out ourselves instead of asking the canvas for the bounding box
+        # of every page it holds.
+        self._max_page_width = max(self._max_page_width, page_image.width())
+        c.configure(scrollregion=(0, 0, self._max_page_width,
+                                  self._y_offset + page_image.height()))
 
         # Offset the next page by the height of this page, plus 4px padding
         self._y_offset += page_image.height() + 4
@@ -499,45 +522,64 @@ class DocViewer(tk.Frame, object):
 
         timeout = 50    # msec
 
+        # Maximum number of items to handle per call
+        # Handling several at once saves on scheduling and display updates
+        # when pages arrive quickly, like when they're in the page cache.
+        batch_size = 8
+
+        # Event handlers may start rendering another file, in which case
+        # any remaining items belong to the old one
+        rendering_queue = self._queue
+
         try:
-            # Pull the next item from the queue
-            item = self._queue.get_nowait()
+            for i in range(batch_size):
+                # Pull the next item from the queue
+                item = rendering_queue.get_nowait()
 
-            if item is None:
-                # A None value indicates we can exit the processing loop
-                self._rendering.set(0)
-                self.event_generate("<<DocumentFinished>>")
+                # More items may be waiting right behind this one, so check
+                # again as soon as Tk has handled any other pending events
+                timeout = 0
 
-            elif isinstance(item, DocumentStarted):
-                # Indicate rendering has started on the document
-                self.event_generate("<<DocumentStarted>>")
+                if item is None:
+                    # A None value indicates we can exit the processing loop
+                    self._rendering.set(False)
+                    self.event_generate("<<DocumentFinished>>")
 
-            elif isinstance(item, PageStarted):
-                # Indicate rendering has started on a page
-                self.event_generate("<<PageStarted>>")
+                elif isinstance(item, DocumentStarted):
+                    # Indicate rendering has started on the document
+                    self.event_generate("<<DocumentStarted>>")
 
-            elif isinstance(item, PageCount):
-                # Update the number of pages in the document
-                self._page_count = int(item)
-                self.event_generate("<<PageCount>>")
+                elif isinstance(item, PageStarted):
+                    # Indicate rendering has started on a page
+                    self.event_generate("<<PageStarted>>")
 
-            elif isinstance(item, Exception):
-                # An exception occurred in the rendering thread
-                self._rendering.set(0)
+                elif isinstance(item, PageCount):
+                    # Update the number of pages in the document
+                    self._page_count = int(item)
+                    self.event_generate("<<PageCount>>")
 
-                # Display the error message on the canvas
-                self.display_text(item)
+                elif isinstance(item, Exception):
+                    # An exception occurred in the rendering thread
+                    self._rendering.set(False)
 
-                # Set the rendered page count to zero since no content
-                # has actually been rendered
-                self._rendered_page_count = 0
+                    # Display the error message on the canvas
+                    self.display_text(item)
 
-                self.event_generate("<<RenderingError>>")
+                    # Set the rendered page count to zero since no content
+                    # has actually been rendered
+                    self._rendered_page_count = 0
 
-            else:
-                # Presume item contains image data
-                self._add_page_to_canvas(item)
-                self.event_generate("<<PageFinished>>")
+                    self.event_generate("<<RenderingError>>")
+
+                else:
+                    # Presume item contains image data
+                    self._add_page_to_canvas(item)
+                    self.event_generate("<<PageFinished>>")
+
+                if (self._queue is not rendering_queue
+                        or not self._rendering.get()):
+                    # We're done with this queue
+                    break
 
         except (queue.Empty):
             # Still waiting on the next item
@@ -550,7 +592,11 @@ class DocViewer(tk.Frame, object):
         # Keep the user interface updated
         self.master.update_idletasks()
 
-        if self._rendering.get():
+        if self._queue is not rendering_queue:
+            # The new rendering thread has its own processing loop
+            return
+
+        elif self._rendering.get():
             # Keep the loop going until we're told to stop
             self.master.after(timeout, self._process_queue)
 
@@ -565,9 +611,10 @@ class DocViewer(tk.Frame, object):
     def _render_image(self, path):
         """Render an image file using PIL.
 
-        This is implemented here for performance reasons; it's much
-        more efficient to process single-frame images in the main
-        thread than to use a backend in a separate rendering thread.
+        Images in the formats we know about are rendered in a background
+        thread by PILImageBackend, so decoding a large image doesn't hold
+        up the user interface. This is only used for extensions added to
+        _builtin_image_extensions that don't have a backend registered.
 
         This function only displays the first frame of multi-frame
         images such as GIF and TIFF. To display all the frames, start
@@ -590,15 +637,37 @@ class DocViewer(tk.Frame, object):
             )
 
     def _render_text(self, path):
-        """Render a plain-text file."""
+        """Render a plain-text file.
+
+        Only the first _TEXT_MAX_CHARS characters of very large files
+        are displayed, since Tk slows to a crawl on huge text items.
+        Undecodable bytes are displayed as replacement characters.
+        """
 
         try:
-            with open(path, "r") as in_file:
-                self.display_text(in_file.read())
+            with open(path, "r", errors="replace") as in_file:
+                text = in_file.read(self._TEXT_MAX_CHARS + 1)
+
+            if len(text) > self._TEXT_MAX_CHARS:
+                text = (text[:self._TEXT_MAX_CHARS]
+                        + "\n\n[File truncated for display]")
+            self.display_text(text)
 
         except (Exception) as err:
             self.display_text(err)
 
+    def _schedule_refresh(self, event=None):
+        """Refresh the display once Tk is idle, if not already scheduled."""
+
+        if not self._refresh_pending:
+            self._refresh_pending = self.after_idle(self._refresh_when_idle)
+
+    def _refresh_when_idle(self):
+        """Refresh the display as scheduled by _schedule_refresh()."""
+
+        self._refresh_pending = None
+        self.refresh()
+
     def _scroll_canvas(self, event):
         """Scroll the canvas."""
 
@@ -624,23 +693,27 @@ class DocViewer(tk.Frame, object):
         """Render a file in a background thread."""
 
         # Flag that we are currently rendering a page
-        self._rendering.set(1)
+        self._rendering.set(True)
 
         # Create a new queue for rendered pages
         # This avoids displaying the wrong file if display_file() is called
         # again before Ghostscript finishes rendering the current file. The
         # old queue will eventually be garbage-collected and its memory freed.
-        self._queue = queue.Queue()
+        # The queue is bounded so the rendering thread can't get too far
+        # ahead of the display and fill memory with pages.
+        self._queue = RenderingQueue(maxsize=queue_size)
 
         # Create a canceler to stop rendering on demand
         self._canceler = threading.Event()
 
-        # Whether to enable downscaling
+        # Whether to enable downscaling, and which color model to use
         enable_downscaling = self._enable_downscaling.get()
+        color_mode = self._color_mode.get()
 
         # Create a rendering thread to render the file
         rt = RenderingThread(self._queue, self._canceler, path, pages,
-                             enable_downscaling=enable_downscaling)
+                             enable_downscaling=enable_downscaling,
+                             color_mode=color_mode)
         rt.start()
 
         # Start this in a loop to render each page on the canvas
@@ -654,6 +727,21 @@ class DocViewer(tk.Frame, object):
 
         return self._canvas
 
+    @property
+    def color_mode(self):
+        """The color model used to render PDF documents.
+
+        This is one of "rgb" (the default), "gray", or "mono". Rendering
+        a black-and-white document in grayscale or black-and-white uses
+        a fraction of the memory needed for full color.
+
+        This is a StringVar that your user interface can change at
+        runtime via a Radiobutton or OptionMenu widget. Changes take
+        effect the next time a document is rendered.
+        """
+
+        return self._color_mode
+
     @property
     def display_pages(self):
         """The list of page numbers to display.
@@ -679,13 +767,16 @@ class DocViewer(tk.Frame, object):
         it is neither necessary nor recommended on most systems.
 
         When downscaling is enabled, Ghostscript will render PDF
-        documents internally at a higher resolution, then DocViewer
-        will resize them for display using PIL. This is inefficient,
-        but it may improve the appearance and readability of some
-        files, such as pure black-and-white scans.
+        documents internally at a higher resolution, then scale them
+        down for display. (Ghostscript versions older than 9.10 can't
+        do this themselves, so DocViewer resizes their output using
+        PIL instead.) This is inefficient, but it may improve the
+        appearance and readability of some files, such as pure
+        black-and-white scans.
 
         If PIL is not available on your system, the enable_downscaling
-        setting will be silently ignored.
+        setting will be silently ignored unless you have Ghostscript 9.10
+        or later and Tk 8.6 or later.
 
         This is a BooleanVar that your user interface can toggle at
         runtime via a Checkbutton widget.
@@ -773,7 +864,7 @@ class DocViewer(tk.Frame, object):
     # ------------------------------------------------------------------------
 
     # Keys for configure() to forward to the canvas widget
-    _CANVAS_KEYS = "width", "height", "takefocus"
+    _CANVAS_KEYS = frozenset(["width", "height", "takefocus"])
 
     # Default font for plain-text output
     _DEFAULT_TEXT_FONT = "Courier", 10
@@ -782,6 +873,9 @@ class DocViewer(tk.Frame, object):
     _TEXT_X_MARGIN = 8
     _TEXT_Y_MARGIN = 8
 
+    # Maximum number of characters to display from a plain-text file
+    _TEXT_MAX_CHARS = 1024 * 1024
+
     # Scrollbar-related configuration
     _DEFAULT_SCROLLBARS = "both"
     _VALID_SCROLLBARS = "vertical", "horizontal", "both", "neither"
@@ -795,12 +889,13 @@ class DocViewer(tk.Frame, object):
     # an undocumented feature, and may be removed from a future release.
 
     # Recognized image extensions
-    # Note: GIF and TIFF support is handled by PILMultiframeBackend.
+    # Note: These are all rendered by backends now, which also handle GIF
+    # and TIFF support, so the two lists overlap.
     _builtin_image_extensions = [".bmp", ".ico", ".jpe", ".jpg", ".jpeg",
                                  ".pbm", ".pcx", ".pgm", ".png", ".pnm",
                                  ".ppm", ".tga", ".xbm"]
-    image_extensions = sorted(_builtin_image_extensions
-                              + BACKEND_IMAGE_EXTENSIONS)
+    image_extensions = sorted(set(_builtin_image_extensions
+                                  + BACKEND_IMAGE_EXTENSIONS))
 
     # Recognized plain-text extensions
     _builtin_text_extensions = [".txt"]